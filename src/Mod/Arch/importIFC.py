@@ -268,6 +268,22 @@ def explore(filename=None):
     return
 
 
+def getBreps(ids):
+    """getBreps(ids): returns a {id:brep} dictionary of the geometry of the
+    given products of ifcfile, converted with geomsettings. Used by the
+    worker processes of insert()"""
+    import ifcopenshell
+    from ifcopenshell import geom
+    breps = {}
+    for pid in ids:
+        try:
+            cr = ifcopenshell.geom.create_shape(geomsettings,ifcfile[pid])
+            breps[pid] = cr.geometry.brep_data
+        except:
+            breps[pid] = None # no shape
+    return breps
+
+
 def open(filename,skip=[],only=[],root=None):
     "opens an IFC file in a new document"
 
@@ -293,6 +309,7 @@ def insert(filename,docname,skip=[],only=[],root=None):
     ROOT_ELEMENT = p.GetString("ifcRootElement","IfcProduct")
     GET_EXTRUSIONS = p.GetBool("ifcGetExtrusions",False)
     MERGE_MATERIALS = p.GetBool("ifcMergeMaterials",False)
+    PROCESSES = p.GetInt("ifcProcesses",1)
     if root:
         ROOT_ELEMENT = root
     MERGE_MODE_ARCH = p.GetInt("ifcImportModeArch",0)
@@ -370,28 +387,33 @@ def insert(filename,docname,skip=[],only=[],root=None):
     for r in ifcfile.by_type("IfcRelAssociatesMaterial"):
         for o in r.RelatedObjects:
             mattable[o.id()] = r.RelatingMaterial.id()
-    for r in ifcfile.by_type("IfcStyledItem"):
+    styleditems = ifcfile.by_type("IfcStyledItem")
+    itemproducts = {} # { representationitemid:[productid, ...] }
+    itemmaterials = {} # { styleditemid:[materialid, ...] }
+    if styleditems:
+        for p in ifcfile.by_type("IfcProduct"):
+            if p.Representation:
+                for it in p.Representation.Representations:
+                    if it.Items:
+                        itemproducts.setdefault(it.Items[0].id(),[]).append(p.id())
+                        if it.Items[0].is_a("IfcBooleanResult"):
+                            itemproducts.setdefault(it.Items[0].FirstOperand.id(),[]).append(p.id())
+        for m in ifcfile.by_type("IfcMaterialDefinitionRepresentation"):
+            for it in m.Representations:
+                if it.Items:
+                    itemmaterials.setdefault(it.Items[0].id(),[]).append(m.RepresentedMaterial.id())
+    for r in styleditems:
         if r.Styles[0].is_a("IfcPresentationStyleAssignment"):
             if r.Styles[0].Styles[0].is_a("IfcSurfaceStyle"):
                 if r.Styles[0].Styles[0].Styles[0].is_a("IfcSurfaceStyleRendering"):
                     if r.Styles[0].Styles[0].Styles[0].SurfaceColour:
                         c = r.Styles[0].Styles[0].Styles[0].SurfaceColour
                         if r.Item:
-                            for p in ifcfile.by_type("IfcProduct"):
-                                if p.Representation:
-                                    for it in p.Representation.Representations:
-                                        if it.Items:
-                                            if it.Items[0].id() == r.Item.id():
-                                                colors[p.id()] = (c.Red,c.Green,c.Blue)
-                                            elif it.Items[0].is_a("IfcBooleanResult"):
-                                                if (it.Items[0].FirstOperand.id() == r.Item.id()):
-                                                    colors[p.id()] = (c.Red,c.Green,c.Blue)
+                            for pid in itemproducts.get(r.Item.id(),[]):
+                                colors[pid] = (c.Red,c.Green,c.Blue)
                         else:
-                            for m in ifcfile.by_type("IfcMaterialDefinitionRepresentation"):
-                                for it in m.Representations:
-                                    if it.Items:
-                                        if it.Items[0].id() == r.id():
-                                            colors[m.RepresentedMaterial.id()] = (c.Red,c.Green,c.Blue)
+                            for mid in itemmaterials.get(r.id(),[]):
+                                colors[mid] = (c.Red,c.Green,c.Blue)
 
     if only: # only import a list of IDs and their children
         ids = []
@@ -404,211 +426,290 @@ def insert(filename,docname,skip=[],only=[],root=None):
 
     if DEBUG: print "done."
 
+    # products sharing the geometry of another one. Only the first of them
+    # gets converted, the others get a copy of its shape, moved
+    mappings = {} # { id:(key,matrix) }
+    mapcache = {} # { key:(shape,matrix) }
+    unitscale = getUnitScale(ifcfile)
+    if unitscale:
+        hosts = []
+        if not SEPARATE_OPENINGS:
+            hosts = [s[1] for s in subtractions]
+        hosts = set(hosts)
+        for product in products:
+            if not product.id() in hosts:
+                mapping = getMapping(product)
+                if mapping:
+                    mappings[product.id()] = mapping
+
+    # converting the geometry in worker processes, which run ahead of the
+    # creation of the objects below. The workers are forked, so they share
+    # ifcfile and geomsettings with this process
+    pool = None
+    breps = {} # { id:brep } converted but not used yet
+    convert = set() # ids converted by the workers
+    if PROCESSES > 1 and hasattr(os,"fork"):
+        keys = set()
+        for product in products:
+            archobj = not product.is_a() in structuralifcobjects
+            if (MERGE_MODE_ARCH == 4 and archobj) or (MERGE_MODE_STRUCT == 3 and not archobj):
+                continue
+            if (product.id() in skip) or (product.is_a() in SKIP):
+                continue
+            if product.id() in mappings:
+                if mappings[product.id()][0] in keys:
+                    continue
+                keys.add(mappings[product.id()][0])
+            convert.add(product.id())
+        if len(convert) > PROCESSES:
+            if DEBUG: print "Converting geometry with ",PROCESSES," processes"
+            import multiprocessing
+            global geomsettings
+            geomsettings = settings
+            ids = [product.id() for product in products if product.id() in convert]
+            chunksize = max(1,min(50,len(ids)/(4*PROCESSES)))
+            pool = multiprocessing.Pool(PROCESSES)
+            brepchunks = pool.imap(getBreps,[ids[i:i+chunksize] for i in range(0,len(ids),chunksize)])
+            pool.close()
+        else:
+            convert = set()
+
     count = 0
     from FreeCAD import Base
     progressbar = Base.ProgressIndicator()
     progressbar.start("Importing IFC objects...",len(products))
     if DEBUG: print "Processing objects..."
 
-    # products
-    for product in products:
-
-        pid = product.id()
-        guid = product.GlobalId
-        ptype = product.is_a()
-        if DEBUG: print count+1,"/",len(products)," creating object #",pid," : ",ptype,
-        name = str(ptype[3:])
-        if product.Name:
-            name = product.Name.decode("unicode_escape").encode("utf8")
-        if PREFIX_NUMBERS: name = "ID" + str(pid) + " " + name
-        obj = None
-        baseobj = None
-        brep = None
-        shape = None
-
-        archobj = True  # assume all objects not in structuralifcobjects are architecture
-        if ptype in structuralifcobjects:
-            archobj = False
-            if DEBUG: print " (struct)",
-        else:
-            if DEBUG: print " (arch)",
-        if MERGE_MODE_ARCH == 4 and archobj:
-            if DEBUG: print " skipped."
-            continue
-        if MERGE_MODE_STRUCT == 3 and not archobj:
-            if DEBUG: print " skipped."
-            continue
-        if pid in skip: # user given id skip list
-            if DEBUG: print " skipped."
-            continue
-        if ptype in SKIP: # preferences-set type skip list
-            if DEBUG: print " skipped."
-            continue
+    done = False
+    try:
+        # products
+        for product in products:
+
+            pid = product.id()
+            guid = product.GlobalId
+            ptype = product.is_a()
+            if DEBUG: print count+1,"/",len(products)," creating object #",pid," : ",ptype,
+            name = str(ptype[3:])
+            if product.Name:
+                name = product.Name.decode("unicode_escape").encode("utf8")
+            if PREFIX_NUMBERS: name = "ID" + str(pid) + " " + name
+            obj = None
+            baseobj = None
+            brep = None
+            shape = None
+
+            archobj = True  # assume all objects not in structuralifcobjects are architecture
+            if ptype in structuralifcobjects:
+                archobj = False
+                if DEBUG: print " (struct)",
+            else:
+                if DEBUG: print " (arch)",
+            if MERGE_MODE_ARCH == 4 and archobj:
+                if DEBUG: print " skipped."
+                continue
+            if MERGE_MODE_STRUCT == 3 and not archobj:
+                if DEBUG: print " skipped."
+                continue
+            if pid in skip: # user given id skip list
+                if DEBUG: print " skipped."
+                continue
+            if ptype in SKIP: # preferences-set type skip list
+                if DEBUG: print " skipped."
+                continue
 
-        # detect if this object is sharing its shape
-        clone = None
-        store = None
-        if product.Representation and MERGE_MODE_ARCH == 0 and archobj:
-            for s in product.Representation.Representations:
-                if s.RepresentationIdentifier.upper() == "BODY":
-                    if s.Items[0].is_a("IfcMappedItem"):
-                        bid = s.Items[0].MappingSource.id()
-                        if bid in sharedobjects:
-                            clone = sharedobjects[bid]
-                        else:
-                            sharedobjects[bid] = None
-                            store = bid
+            # detect if this object is sharing its shape
+            clone = None
+            store = None
+            if product.Representation and MERGE_MODE_ARCH == 0 and archobj:
+                for s in product.Representation.Representations:
+                    if s.RepresentationIdentifier.upper() == "BODY":
+                        if s.Items[0].is_a("IfcMappedItem"):
+                            bid = s.Items[0].MappingSource.id()
+                            if bid in sharedobjects:
+                                clone = sharedobjects[bid]
+                            else:
+                                sharedobjects[bid] = None
+                                store = bid
+
+            if (pid in mappings) and (mappings[pid][0] in mapcache):
+                # same geometry as an already converted product
+                source,matrix = mapcache[mappings[pid][0]]
+                m = mappings[pid][1].multiply(matrix.inverse())
+                m.A14 *= unitscale
+                m.A24 *= unitscale
+                m.A34 *= unitscale
+                shape = source.copy()
+                shape.Placement = FreeCAD.Placement(m).multiply(source.Placement)
+                if DEBUG: print " mapped ",
+            else:
+                if pid in convert:
+                    while not pid in breps:
+                        breps.update(brepchunks.next())
+                    brep = breps.pop(pid)
+                else:
+                    try:
+                        cr = ifcopenshell.geom.create_shape(settings,product)
+                        brep = cr.geometry.brep_data
+                    except:
+                        pass # IfcOpenShell will yield an error if a given product has no shape, but we don't care
 
-        try:
-            cr = ifcopenshell.geom.create_shape(settings,product)
-            brep = cr.geometry.brep_data
-        except:
-            pass # IfcOpenShell will yield an error if a given product has no shape, but we don't care
+                if brep:
+                    if DEBUG: print " ",str(len(brep)/1000),"k ",
+
+                    shape = Part.Shape()
+                    shape.importBrepFromString(brep)
 
-        if brep:
-            if DEBUG: print " ",str(len(brep)/1000),"k ",
+                    shape.scale(1000.0) # IfcOpenShell always outputs in meters
 
-            shape = Part.Shape()
-            shape.importBrepFromString(brep)
+                    if (pid in mappings) and not shape.isNull():
+                        mapcache[mappings[pid][0]] = (shape,mappings[pid][1])
 
-            shape.scale(1000.0) # IfcOpenShell always outputs in meters
+            if shape:
 
-            if not shape.isNull():
-                if (MERGE_MODE_ARCH > 0 and archobj) or not archobj:
-                    if ptype == "IfcSpace": # do not add spaces to compounds
-                        if DEBUG: print "skipping space ",pid
-                    elif not archobj:
-                        structshapes[pid] = shape
-                        if DEBUG: print shape.Solids," ",
-                        baseobj = shape
+                if not shape.isNull():
+                    if (MERGE_MODE_ARCH > 0 and archobj) or not archobj:
+                        if ptype == "IfcSpace": # do not add spaces to compounds
+                            if DEBUG: print "skipping space ",pid
+                        elif not archobj:
+                            structshapes[pid] = shape
+                            if DEBUG: print shape.Solids," ",
+                            baseobj = shape
+                        else:
+                            shapes[pid] = shape
+                            if DEBUG: print shape.Solids," ",
+                            baseobj = shape
                     else:
-                        shapes[pid] = shape
-                        if DEBUG: print shape.Solids," ",
-                        baseobj = shape
+                        if clone:
+                            if DEBUG: print "clone ",
+                        else:
+                            if GET_EXTRUSIONS:
+                                ex = Arch.getExtrusionData(shape)
+                                if ex:
+                                    print "extrusion ",
+                                    baseface = FreeCAD.ActiveDocument.addObject("Part::Feature",name+"_footprint")
+                                    baseface.Shape = ex[0]
+                                    baseobj = FreeCAD.ActiveDocument.addObject("Part::Extrusion",name+"_body")
+                                    baseobj.Base = baseface
+                                    baseobj.Dir = ex[1]
+                                    if FreeCAD.GuiUp:
+                                        baseface.ViewObject.hide()
+                            if (not baseobj):
+                                baseobj = FreeCAD.ActiveDocument.addObject("Part::Feature",name+"_body")
+                                baseobj.Shape = shape
                 else:
-                    if clone:
-                        if DEBUG: print "clone ",
-                    else:
-                        if GET_EXTRUSIONS:
-                            ex = Arch.getExtrusionData(shape)
-                            if ex:
-                                print "extrusion ",
-                                baseface = FreeCAD.ActiveDocument.addObject("Part::Feature",name+"_footprint")
-                                baseface.Shape = ex[0]
-                                baseobj = FreeCAD.ActiveDocument.addObject("Part::Extrusion",name+"_body")
-                                baseobj.Base = baseface
-                                baseobj.Dir = ex[1]
-                                if FreeCAD.GuiUp:
-                                    baseface.ViewObject.hide()
-                        if (not baseobj):
-                            baseobj = FreeCAD.ActiveDocument.addObject("Part::Feature",name+"_body")
-                            baseobj.Shape = shape
+                    if DEBUG: print  "null shape ",
+                if not shape.isValid():
+                    if DEBUG: print "invalid shape ",
+                    #continue
+
             else:
-                if DEBUG: print  "null shape ",
-            if not shape.isValid():
-                if DEBUG: print "invalid shape ",
-                #continue
+                if DEBUG: print " no brep ",
+
+            if MERGE_MODE_ARCH == 0 and archobj:
+
+                # full Arch objects
+                for freecadtype,ifctypes in typesmap.items():
+                    if ptype in ifctypes:
+                        if clone:
+                            obj = getattr(Arch,"make"+freecadtype)(name=name)
+                            obj.CloneOf = clone
+                            if shape:
+                                v = shape.Solids[0].CenterOfMass.sub(clone.Shape.Solids[0].CenterOfMass)
+                                r = getRotation(product)
+                                if not r.isNull():
+                                    v = v.add(clone.Shape.Solids[0].CenterOfMass)
+                                    v = v.add(r.multVec(clone.Shape.Solids[0].CenterOfMass.negative()))
+                                obj.Placement.Rotation = r
+                                obj.Placement.move(v)
+                        else:
+                            obj = getattr(Arch,"make"+freecadtype)(baseobj=baseobj,name=name)
+                            if store:
+                                sharedobjects[store] = obj
+                        obj.Label = name
+                        if FreeCAD.GuiUp and baseobj:
+                            if hasattr(baseobj,"ViewObject"):
+                                baseobj.ViewObject.hide()
+                        # setting role
+                        try:
+                            r = ptype[3:]
+                            tr = dict((v,k) for k, v in translationtable.iteritems())
+                            if r in tr.keys():
+                                r = tr[r]
+                            # remove the "StandardCase"
+                            if "StandardCase" in r:
+                                r = r[:-12]
+                            obj.Role = r
+                        except:
+                            pass
+                        # setting uid
+                        if hasattr(obj,"IfcAttributes"):
+                            a = obj.IfcAttributes
+                            a["IfcUID"] = str(guid)
+                            obj.IfcAttributes = a
+                        break
+                if not obj:
+                    obj = Arch.makeComponent(baseobj,name=name)
+                if obj:
+                    sols = str(obj.Shape.Solids) if hasattr(obj,"Shape") else ""
+                    if DEBUG: print sols
+                    objects[pid] = obj
+
+            elif (MERGE_MODE_ARCH == 1 and archobj) or (MERGE_MODE_STRUCT == 0 and not archobj):
+
+                # non-parametric Arch objects
+                if ptype in ["IfcSite","IfcBuilding","IfcBuildingStorey"]:
+                    for freecadtype,ifctypes in typesmap.items():
+                        if ptype in ifctypes:
+                            obj = getattr(Arch,"make"+freecadtype)(baseobj=None,name=name)
+                elif baseobj:
+                    obj = Arch.makeComponent(baseobj,name=name,delete=True)
+
+            elif (MERGE_MODE_ARCH == 2 and archobj) or (MERGE_MODE_STRUCT == 1 and not archobj):
+
+                # Part shapes
+                if ptype in ["IfcSite","IfcBuilding","IfcBuildingStorey"]:
+                    for freecadtype,ifctypes in typesmap.items():
+                        if ptype in ifctypes:
+                            obj = getattr(Arch,"make"+freecadtype)(baseobj=None,name=name)
+                elif baseobj:
+                    obj = FreeCAD.ActiveDocument.addObject("Part::Feature",name)
+                    obj.Shape = shape
 
-        else:
-            if DEBUG: print " no brep ",
-
-        if MERGE_MODE_ARCH == 0 and archobj:
-
-            # full Arch objects
-            for freecadtype,ifctypes in typesmap.items():
-                if ptype in ifctypes:
-                    if clone:
-                        obj = getattr(Arch,"make"+freecadtype)(name=name)
-                        obj.CloneOf = clone
-                        if shape:
-                            v = shape.Solids[0].CenterOfMass.sub(clone.Shape.Solids[0].CenterOfMass)
-                            r = getRotation(product)
-                            if not r.isNull():
-                                v = v.add(clone.Shape.Solids[0].CenterOfMass)
-                                v = v.add(r.multVec(clone.Shape.Solids[0].CenterOfMass.negative()))
-                            obj.Placement.Rotation = r
-                            obj.Placement.move(v)
-                    else:
-                        obj = getattr(Arch,"make"+freecadtype)(baseobj=baseobj,name=name)
-                        if store:
-                            sharedobjects[store] = obj
-                    obj.Label = name
-                    if FreeCAD.GuiUp and baseobj:
-                        if hasattr(baseobj,"ViewObject"):
-                            baseobj.ViewObject.hide()
-                    # setting role
-                    try:
-                        r = ptype[3:]
-                        tr = dict((v,k) for k, v in translationtable.iteritems())
-                        if r in tr.keys():
-                            r = tr[r]
-                        # remove the "StandardCase"
-                        if "StandardCase" in r:
-                            r = r[:-12]
-                        obj.Role = r
-                    except:
-                        pass
-                    # setting uid
-                    if hasattr(obj,"IfcAttributes"):
-                        a = obj.IfcAttributes
-                        a["IfcUID"] = str(guid)
-                        obj.IfcAttributes = a
-                    break
-            if not obj:
-                obj = Arch.makeComponent(baseobj,name=name)
             if obj:
-                sols = str(obj.Shape.Solids) if hasattr(obj,"Shape") else ""
-                if DEBUG: print sols
+
+                obj.Label = name
                 objects[pid] = obj
 
-        elif (MERGE_MODE_ARCH == 1 and archobj) or (MERGE_MODE_STRUCT == 0 and not archobj):
+                # properties
+                if pid in properties:
+                    if hasattr(obj,"IfcAttributes"):
+                        a = obj.IfcAttributes
+                        for p in properties[pid]:
+                            o = ifcfile[p]
+                            if o.is_a("IfcPropertySingleValue"):
+                                a[o.Name.decode("unicode_escape").encode("utf8")] = str(o.NominalValue)
+                        obj.IfcAttributes = a
 
-            # non-parametric Arch objects
-            if ptype in ["IfcSite","IfcBuilding","IfcBuildingStorey"]:
-                for freecadtype,ifctypes in typesmap.items():
-                    if ptype in ifctypes:
-                        obj = getattr(Arch,"make"+freecadtype)(baseobj=None,name=name)
-            elif baseobj:
-                obj = Arch.makeComponent(baseobj,name=name,delete=True)
+                # color
+                if FreeCAD.GuiUp and (pid in colors) and hasattr(obj.ViewObject,"ShapeColor"):
+                    if DEBUG: print "    setting color: ",int(colors[pid][0]*255),"/",int(colors[pid][1]*255),"/",int(colors[pid][2]*255)
+                    obj.ViewObject.ShapeColor = colors[pid]
 
-        elif (MERGE_MODE_ARCH == 2 and archobj) or (MERGE_MODE_STRUCT == 1 and not archobj):
+                # if DEBUG is on, recompute after each shape
+                if DEBUG: FreeCAD.ActiveDocument.recompute()
 
-            # Part shapes
-            if ptype in ["IfcSite","IfcBuilding","IfcBuildingStorey"]:
-                for freecadtype,ifctypes in typesmap.items():
-                    if ptype in ifctypes:
-                        obj = getattr(Arch,"make"+freecadtype)(baseobj=None,name=name)
-            elif baseobj:
-                obj = FreeCAD.ActiveDocument.addObject("Part::Feature",name)
-                obj.Shape = shape
-
-        if obj:
-
-            obj.Label = name
-            objects[pid] = obj
-
-            # properties
-            if pid in properties:
-                if hasattr(obj,"IfcAttributes"):
-                    a = obj.IfcAttributes
-                    for p in properties[pid]:
-                        o = ifcfile[p]
-                        if o.is_a("IfcPropertySingleValue"):
-                            a[o.Name.decode("unicode_escape").encode("utf8")] = str(o.NominalValue)
-                    obj.IfcAttributes = a
-
-            # color
-            if FreeCAD.GuiUp and (pid in colors) and hasattr(obj.ViewObject,"ShapeColor"):
-                if DEBUG: print "    setting color: ",int(colors[pid][0]*255),"/",int(colors[pid][1]*255),"/",int(colors[pid][2]*255)
-                obj.ViewObject.ShapeColor = colors[pid]
-
-            # if DEBUG is on, recompute after each shape
-            if DEBUG: FreeCAD.ActiveDocument.recompute()
+            count += 1
+            progressbar.next()
 
-        count += 1
-        progressbar.next()
+        done = True
+    finally:
+        progressbar.stop()
+        # if something failed, the workers would otherwise go on converting the whole file
+        if pool:
+            if not done:
+                pool.terminate()
+            pool.join()
 
-    progressbar.stop()
     FreeCAD.ActiveDocument.recompute()
 
     if MERGE_MODE_STRUCT == 2:
@@ -809,12 +910,15 @@ def export(exportList,filename):
     template = template.replace("$project",FreeCAD.ActiveDocument.Name)
     template = template.replace("$filename",filename)
     template = template.replace("$timestamp",str(time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime())))
-    templatefile = tempfile.mkstemp(suffix=".ifc")[1]
+    fd,templatefile = tempfile.mkstemp(suffix=".ifc")
+    os.close(fd)
     of = pyopen(templatefile,"wb")
     of.write(template.encode("utf8"))
     of.close()
-    global ifcfile, surfstyles, clones, sharedobjects
+    global ifcfile, surfstyles, clones, clonebases, sharedobjects, sharedentities
+    global extrusions, extrusionkeys, sharedextrusions
     ifcfile = ifcopenshell.open(templatefile)
+    os.remove(templatefile)
     history = ifcfile.by_type("IfcOwnerHistory")[0]
     context = ifcfile.by_type("IfcGeometricRepresentationContext")[0]
     project = ifcfile.by_type("IfcProject")[0]
@@ -823,7 +927,12 @@ def export(exportList,filename):
     products = {} # { Name: IfcEntity, ... }
     surfstyles = {} # { (r,g,b): IfcEntity, ... }
     clones = {} # { Basename:[Clonename1,Clonename2,...] }
+    clonebases = {} # { Clonename:Basename, Basename:Basename }
     sharedobjects = {} # { BaseName: IfcRepresentationMap }
+    sharedentities = {} # { (type,values): IfcEntity } points, directions... used several times
+    extrusions = {} # { Name: (profile,extrusion,placement,key) }
+    extrusionkeys = {} # { key: number of objects with that extrusion }
+    sharedextrusions = {} # { key: IfcRepresentationMap }
     count = 1
 
     # build clones table
@@ -831,13 +940,28 @@ def export(exportList,filename):
         b = Draft.getCloneBase(o,strict=True)
         if b:
             clones.setdefault(b.Name,[]).append(o.Name)
-            
-    print "clones table: ",clones
-    print objectslist
+            clonebases[o.Name] = b.Name
+            clonebases[b.Name] = b.Name
+
+    if DEBUG: print "clones table: ",clones
+
+    # count identical extrusions, they get exported once as a representation map
+    if not FORCEBREP:
+        for o in objectslist:
+            if (not o.Name in clonebases) and (not getBrepFlag(o)):
+                e = getExtrusion(o)
+                if e:
+                    extrusionkeys[e[3]] = extrusionkeys.get(e[3],0) + 1
+
+    from FreeCAD import Base
+    progressbar = Base.ProgressIndicator()
+    progressbar.start("Exporting IFC objects...",len(objectslist))
 
     # products
     for obj in objectslist:
 
+        progressbar.next()
+
         # getting generic data
         name = str(obj.Label.encode("utf8"))
         description = str(obj.Description) if hasattr(obj,"Description") else ""
@@ -867,11 +991,7 @@ def export(exportList,filename):
             ifctype = "IfcBuildingElementProxy"
 
         # getting the "Force BREP" flag
-        brepflag = False
-        if hasattr(obj,"IfcAttributes"):
-            if "FlagForceBrep" in obj.IfcAttributes.keys():
-                if obj.IfcAttributes["FlagForceBrep"] == "True":
-                    brepflag = True
+        brepflag = getBrepFlag(obj)
 
         # getting the representation
         representation,placement,shapetype = getRepresentation(ifcfile,context,obj,forcebrep=(brepflag or FORCEBREP))
@@ -953,6 +1073,8 @@ def export(exportList,filename):
 
         count += 1
 
+    progressbar.stop()
+
     # relationships
     sites = []
     buildings = []
@@ -1015,6 +1137,104 @@ def export(exportList,filename):
     ifcfile.write(filename)
 
 
+def getSharedEntity(ifcfile,ifctype,values):
+    """getSharedEntity(ifcfile,ifctype,values): returns an entity of the given
+    type (IfcCartesianPoint or IfcDirection) created from the values, or the
+    one already created from the same values"""
+    values = tuple(values)
+    key = (ifctype,values)
+    if not key in sharedentities:
+        sharedentities[key] = getattr(ifcfile,"create"+ifctype)(values)
+    return sharedentities[key]
+
+
+def getIdentityPlacement(ifcfile):
+    """getIdentityPlacement(ifcfile): returns the IfcAxis2Placement3D at the
+    origin with the default axes, created only once per file"""
+    key = ("IfcAxis2Placement3D",())
+    if not key in sharedentities:
+        xvc = getSharedEntity(ifcfile,"IfcDirection",(1.0,0.0,0.0))
+        zvc = getSharedEntity(ifcfile,"IfcDirection",(0.0,0.0,1.0))
+        ovc = getSharedEntity(ifcfile,"IfcCartesianPoint",(0.0,0.0,0.0))
+        sharedentities[key] = ifcfile.createIfcAxis2Placement3D(ovc,zvc,xvc)
+    return sharedentities[key]
+
+
+def getBrepFlag(obj):
+    "getBrepFlag(obj): returns True if the object is flagged to be exported as brep"
+    if hasattr(obj,"IfcAttributes"):
+        if "FlagForceBrep" in obj.IfcAttributes.keys():
+            if obj.IfcAttributes["FlagForceBrep"] == "True":
+                return True
+    return False
+
+
+def getExtrusion(obj):
+    """getExtrusion(obj): returns a (profile,extrusion,placement,key) tuple, in
+    meters, if the object can be exported as an extruded profile, otherwise None.
+    Objects with the same key have the same extrusion at different placements.
+    Computed once per object and export"""
+    if obj.Name in extrusions:
+        return extrusions[obj.Name]
+    import Part,DraftVecUtils
+    extrusions[obj.Name] = None
+    if hasattr(obj,"Proxy"):
+        if hasattr(obj.Proxy,"getProfiles"):
+            p = obj.Proxy.getProfiles(obj,noplacement=True)
+            extrusionv = obj.Proxy.getExtrusionVector(obj,noplacement=True)
+            if not DraftVecUtils.isNull(extrusionv):
+                extrusionv.multiply(0.001) # to meters
+                if (len(p) == 1) and extrusionv:
+                    p = p[0]
+                    p.scale(0.001) # to meters
+                    r = obj.Proxy.getPlacement(obj)
+                    r.Base = r.Base.multiply(0.001) # to meters
+                    key = [tuple([round(c,9) for c in extrusionv])]
+                    for e in p.Edges:
+                        k = [e.Curve.__class__.__name__]
+                        for v in e.Vertexes:
+                            k.extend([round(c,9) for c in v.Point])
+                        # an interior point tells which way an arc goes between its ends
+                        k.extend([round(c,9) for c in e.valueAt((e.FirstParameter+e.LastParameter)/2)])
+                        if isinstance(e.Curve,Part.Circle):
+                            k.extend([round(c,9) for c in e.Curve.Center])
+                            k.extend([round(c,9) for c in e.Curve.Axis])
+                            k.append(round(e.Curve.Radius,9))
+                        elif isinstance(e.Curve,Part.Ellipse):
+                            k.extend([round(c,9) for c in e.Curve.Center])
+                            k.extend([round(e.Curve.MajorRadius,9),round(e.Curve.MinorRadius,9)])
+                        key.append(tuple(k))
+                    extrusions[obj.Name] = (p,extrusionv,r,tuple(key))
+    return extrusions[obj.Name]
+
+
+def getMappedItem(ifcfile,repmap,rotation,origin):
+    """getMappedItem(ifcfile,repmap,rotation,origin): returns an IfcMappedItem
+    placing the given IfcRepresentationMap with the given rotation and origin (in meters)"""
+    axis1 = ifcfile.createIfcDirection(tuple(rotation.multVec(FreeCAD.Vector(1,0,0))))
+    axis2 = ifcfile.createIfcDirection(tuple(rotation.multVec(FreeCAD.Vector(0,1,0))))
+    axis3 = ifcfile.createIfcDirection(tuple(rotation.multVec(FreeCAD.Vector(0,0,1))))
+    origin = ifcfile.createIfcCartesianPoint(tuple(origin))
+    transf = ifcfile.createIfcCartesianTransformationOperator3D(axis1,axis2,origin,1.0,axis3)
+    return ifcfile.createIfcMappedItem(repmap,transf)
+
+
+def getPolyLoop(ifcfile,verts):
+    """getPolyLoop(ifcfile,verts): returns an IfcPolyLoop through the given points,
+    skipping consecutive duplicates (the points are shared, and a loop can't hold
+    the same point twice), or None if less than 3 points remain"""
+    coords = []
+    for v in verts:
+        v = tuple(v)
+        if (not coords) or (v != coords[-1]):
+            coords.append(v)
+    if len(coords) > 1 and coords[-1] == coords[0]:
+        coords.pop()
+    if len(coords) < 3:
+        return None
+    return ifcfile.createIfcPolyLoop([getSharedEntity(ifcfile,"IfcCartesianPoint",v) for v in coords])
+
+
 def getRepresentation(ifcfile,context,obj,forcebrep=False,subtraction=False,tessellation=1):
     """returns an IfcShapeRepresentation object or None"""
 
@@ -1026,123 +1246,126 @@ def getRepresentation(ifcfile,context,obj,forcebrep=False,subtraction=False,tess
     tostore = False
     
     # check for clones
-    for k,v in clones.items():
-        if (obj.Name == k ) or (obj.Name in v):
-            if k in sharedobjects:
-                # base shape already exists
-                repmap = sharedobjects[k]
-                pla = obj.Placement
-                axis1 = ifcfile.createIfcDirection(tuple(pla.Rotation.multVec(FreeCAD.Vector(1,0,0))))
-                axis2 = ifcfile.createIfcDirection(tuple(pla.Rotation.multVec(FreeCAD.Vector(0,1,0))))
-                axis3 = ifcfile.createIfcDirection(tuple(pla.Rotation.multVec(FreeCAD.Vector(0,0,1))))
-                origin = ifcfile.createIfcCartesianPoint(tuple(FreeCAD.Vector(pla.Base).multiply(0.001)))
-                transf = ifcfile.createIfcCartesianTransformationOperator3D(axis1,axis2,origin,1.0,axis3)
-                mapitem = ifcfile.createIfcMappedItem(repmap,transf)
-                shapes = [mapitem]
-                solidType = "MappedRepresentation"
-                shapetype = "clone"
-            else:
-                # base shape not yet created
-                tostore = k
+    if obj.Name in clonebases:
+        k = clonebases[obj.Name]
+        if k in sharedobjects:
+            # base shape already exists
+            repmap = sharedobjects[k]
+            pla = obj.Placement
+            mapitem = getMappedItem(ifcfile,repmap,pla.Rotation,FreeCAD.Vector(pla.Base).multiply(0.001))
+            shapes = [mapitem]
+            solidType = "MappedRepresentation"
+            shapetype = "clone"
+        else:
+            # base shape not yet created
+            tostore = k
 
     if (not shapes) and (not forcebrep):
         profile = None
-        if hasattr(obj,"Proxy"):
-            if hasattr(obj.Proxy,"getProfiles"):
-                p = obj.Proxy.getProfiles(obj,noplacement=True)
-                extrusionv = obj.Proxy.getExtrusionVector(obj,noplacement=True)
-                if not DraftVecUtils.isNull(extrusionv):
-                    extrusionv.multiply(0.001) # to meters
-                    if (len(p) == 1) and extrusionv:
-                        p = p[0]
-                        p.scale(0.001) # to meters
-                        r = obj.Proxy.getPlacement(obj)
-                        r.Base = r.Base.multiply(0.001) # to meters
-
-                        if len(p.Edges) == 1:
-
-                            pxvc = ifcfile.createIfcDirection((1.0,0.0))
-                            povc = ifcfile.createIfcCartesianPoint((0.0,0.0))
-                            pt = ifcfile.createIfcAxis2Placement2D(povc,pxvc)
-
-                            # extruded circle
-                            if isinstance(p.Edges[0].Curve,Part.Circle):
-                                profile = ifcfile.createIfcCircleProfileDef("AREA",None,pt, p.Edges[0].Curve.Radius)
-
-                            # extruded ellipse
-                            elif isinstance(p.Edges[0].Curve,Part.Ellipse):
-                                profile = ifcfile.createIfcEllipseProfileDef("AREA",None,pt, p.Edges[0].Curve.MajorRadius, p.Edges[0].Curve.MinorRadius)
+        extrusion = getExtrusion(obj)
+        if extrusion:
+            p,extrusionv,r,key = extrusion
+            if (key in sharedextrusions) and (not tostore):
+                # same extrusion as an object already exported
+                shapes = [getMappedItem(ifcfile,sharedextrusions[key],r.Rotation,r.Base)]
+                solidType = "MappedRepresentation"
+                shapetype = "extrusion"
 
-                        else:
-                            curves = False
-                            for e in p.Edges:
-                                if isinstance(e.Curve,Part.Circle):
-                                    curves = True
-
-                            # extruded polyline
-                            if not curves:
-                                w = Part.Wire(Part.__sortEdges__(p.Edges))
-                                pts = [ifcfile.createIfcCartesianPoint(tuple(v.Point)[:2]) for v in w.Vertexes+[w.Vertexes[0]]]
-                                pol = ifcfile.createIfcPolyline(pts)
-
-                            # extruded composite curve
-                            else:
-                                segments = []
-                                last = None
-                                edges = Part.__sortEdges__(p.Edges)
-                                for e in edges:
-                                    if isinstance(e.Curve,Part.Circle):
-                                        follow = True
-                                        if last:
-                                            if not DraftVecUtils.equals(last,e.Vertexes[0].Point):
-                                                follow = False
-                                                last = e.Vertexes[0].Point
-                                            else:
-                                                last = e.Vertexes[-1].Point
-                                        else:
-                                            last = e.Vertexes[-1].Point
-                                        p1 = math.degrees(-DraftVecUtils.angle(e.Vertexes[0].Point.sub(e.Curve.Center)))
-                                        p2 = math.degrees(-DraftVecUtils.angle(e.Vertexes[-1].Point.sub(e.Curve.Center)))
-                                        da = DraftVecUtils.angle(e.valueAt(e.FirstParameter+0.1).sub(e.Curve.Center),e.Vertexes[0].Point.sub(e.Curve.Center))
-                                        if p1 < 0:
-                                            p1 = 360 + p1
-                                        if p2 < 0:
-                                            p2 = 360 + p2
-                                        if da > 0:
-                                            follow = not(follow)
-                                        xvc =       ifcfile.createIfcDirection((1.0,0.0))
-                                        ovc =       ifcfile.createIfcCartesianPoint(tuple(e.Curve.Center)[:2])
-                                        plc =       ifcfile.createIfcAxis2Placement2D(ovc,xvc)
-                                        cir =       ifcfile.createIfcCircle(plc,e.Curve.Radius)
-                                        curve =     ifcfile.createIfcTrimmedCurve(cir,[ifcfile.createIfcParameterValue(p1)],[ifcfile.createIfcParameterValue(p2)],follow,"PARAMETER")
+            else:
+                if len(p.Edges) == 1:
 
+                    pxvc = getSharedEntity(ifcfile,"IfcDirection",(1.0,0.0))
+                    povc = getSharedEntity(ifcfile,"IfcCartesianPoint",(0.0,0.0))
+                    pt = ifcfile.createIfcAxis2Placement2D(povc,pxvc)
+
+                    # extruded circle
+                    if isinstance(p.Edges[0].Curve,Part.Circle):
+                        profile = ifcfile.createIfcCircleProfileDef("AREA",None,pt, p.Edges[0].Curve.Radius)
+
+                    # extruded ellipse
+                    elif isinstance(p.Edges[0].Curve,Part.Ellipse):
+                        profile = ifcfile.createIfcEllipseProfileDef("AREA",None,pt, p.Edges[0].Curve.MajorRadius, p.Edges[0].Curve.MinorRadius)
+
+                else:
+                    curves = False
+                    for e in p.Edges:
+                        if isinstance(e.Curve,Part.Circle):
+                            curves = True
+
+                    # extruded polyline
+                    if not curves:
+                        w = Part.Wire(Part.__sortEdges__(p.Edges))
+                        pts = [getSharedEntity(ifcfile,"IfcCartesianPoint",tuple(v.Point)[:2]) for v in w.Vertexes+[w.Vertexes[0]]]
+                        pol = ifcfile.createIfcPolyline(pts)
+
+                    # extruded composite curve
+                    else:
+                        segments = []
+                        last = None
+                        edges = Part.__sortEdges__(p.Edges)
+                        for e in edges:
+                            if isinstance(e.Curve,Part.Circle):
+                                follow = True
+                                if last:
+                                    if not DraftVecUtils.equals(last,e.Vertexes[0].Point):
+                                        follow = False
+                                        last = e.Vertexes[0].Point
                                     else:
-                                        verts = [vertex.Point for vertex in e.Vertexes]
-                                        if last:
-                                            if not DraftVecUtils.equals(last,verts[0]):
-                                                verts.reverse()
-                                                last = e.Vertexes[0].Point
-                                            else:
-                                                last = e.Vertexes[-1].Point
-                                        else:
-                                            last = e.Vertexes[-1].Point
-                                        pts =     [ifcfile.createIfcCartesianPoint(tuple(v)[:2]) for v in verts]
-                                        curve =   ifcfile.createIfcPolyline(pts)
-                                    segment = ifcfile.createIfcCompositeCurveSegment("CONTINUOUS",True,curve)
-                                    segments.append(segment)
+                                        last = e.Vertexes[-1].Point
+                                else:
+                                    last = e.Vertexes[-1].Point
+                                p1 = math.degrees(-DraftVecUtils.angle(e.Vertexes[0].Point.sub(e.Curve.Center)))
+                                p2 = math.degrees(-DraftVecUtils.angle(e.Vertexes[-1].Point.sub(e.Curve.Center)))
+                                da = DraftVecUtils.angle(e.valueAt(e.FirstParameter+0.1).sub(e.Curve.Center),e.Vertexes[0].Point.sub(e.Curve.Center))
+                                if p1 < 0:
+                                    p1 = 360 + p1
+                                if p2 < 0:
+                                    p2 = 360 + p2
+                                if da > 0:
+                                    follow = not(follow)
+                                xvc =       getSharedEntity(ifcfile,"IfcDirection",(1.0,0.0))
+                                ovc =       ifcfile.createIfcCartesianPoint(tuple(e.Curve.Center)[:2])
+                                plc =       ifcfile.createIfcAxis2Placement2D(ovc,xvc)
+                                cir =       ifcfile.createIfcCircle(plc,e.Curve.Radius)
+                                curve =     ifcfile.createIfcTrimmedCurve(cir,[ifcfile.createIfcParameterValue(p1)],[ifcfile.createIfcParameterValue(p2)],follow,"PARAMETER")
+
+                            else:
+                                verts = [vertex.Point for vertex in e.Vertexes]
+                                if last:
+                                    if not DraftVecUtils.equals(last,verts[0]):
+                                        verts.reverse()
+                                        last = e.Vertexes[0].Point
+                                    else:
+                                        last = e.Vertexes[-1].Point
+                                else:
+                                    last = e.Vertexes[-1].Point
+                                pts =     [getSharedEntity(ifcfile,"IfcCartesianPoint",tuple(v)[:2]) for v in verts]
+                                curve =   ifcfile.createIfcPolyline(pts)
+                            segment = ifcfile.createIfcCompositeCurveSegment("CONTINUOUS",True,curve)
+                            segments.append(segment)
 
-                                pol = ifcfile.createIfcCompositeCurve(segments,False)
-                            profile = ifcfile.createIfcArbitraryClosedProfileDef("AREA",None,pol)
+                        pol = ifcfile.createIfcCompositeCurve(segments,False)
+                    profile = ifcfile.createIfcArbitraryClosedProfileDef("AREA",None,pol)
 
         if profile:
-            xvc =       ifcfile.createIfcDirection(tuple(r.Rotation.multVec(FreeCAD.Vector(1,0,0))))
-            zvc =       ifcfile.createIfcDirection(tuple(r.Rotation.multVec(FreeCAD.Vector(0,0,1))))
-            ovc =       ifcfile.createIfcCartesianPoint(tuple(r.Base))
-            lpl =       ifcfile.createIfcAxis2Placement3D(ovc,zvc,xvc)
-            edir =      ifcfile.createIfcDirection(tuple(FreeCAD.Vector(extrusionv).normalize()))
-            shape =     ifcfile.createIfcExtrudedAreaSolid(profile,lpl,edir,extrusionv.Length)
-            shapes.append(shape)
-            solidType = "SweptSolid"
+            edir =      getSharedEntity(ifcfile,"IfcDirection",tuple(FreeCAD.Vector(extrusionv).normalize()))
+            if (extrusionkeys.get(key,0) > 1) and (not tostore):
+                # other objects have the same extrusion: it is exported once,
+                # at the origin, and placed by a mapped item for each of them
+                shape = ifcfile.createIfcExtrudedAreaSolid(profile,getIdentityPlacement(ifcfile),edir,extrusionv.Length)
+                subrep = ifcfile.createIfcShapeRepresentation(context,'Body','SweptSolid',[shape])
+                repmap = ifcfile.createIfcRepresentationMap(getIdentityPlacement(ifcfile),subrep)
+                sharedextrusions[key] = repmap
+                shapes.append(getMappedItem(ifcfile,repmap,r.Rotation,r.Base))
+                solidType = "MappedRepresentation"
+            else:
+                xvc =       ifcfile.createIfcDirection(tuple(r.Rotation.multVec(FreeCAD.Vector(1,0,0))))
+                zvc =       ifcfile.createIfcDirection(tuple(r.Rotation.multVec(FreeCAD.Vector(0,0,1))))
+                ovc =       ifcfile.createIfcCartesianPoint(tuple(r.Base))
+                lpl =       ifcfile.createIfcAxis2Placement3D(ovc,zvc,xvc)
+                shape =     ifcfile.createIfcExtrudedAreaSolid(profile,lpl,edir,extrusionv.Length)
+                shapes.append(shape)
+                solidType = "SweptSolid"
             shapetype = "extrusion"
 
     if not shapes:
@@ -1202,8 +1425,9 @@ def getRepresentation(ifcfile,context,obj,forcebrep=False,subtraction=False,tess
                     n = fcface.normalAt(0,0)
                     if DraftVecUtils.angle(v2,v1,n) >= 0:
                         verts.reverse() # inverting verts order if the direction is couterclockwise
-                    pts =   [ifcfile.createIfcCartesianPoint(tuple(v)) for v in verts]
-                    loop =  ifcfile.createIfcPolyLoop(pts)
+                    loop =  getPolyLoop(ifcfile,verts)
+                    if not loop:
+                        continue # degenerate face
                     bound = ifcfile.createIfcFaceOuterBound(loop,True)
                     loops.append(bound)
                     for wire in fcface.Wires:
@@ -1213,10 +1437,10 @@ def getRepresentation(ifcfile,context,obj,forcebrep=False,subtraction=False,tess
                             v2 = verts[1].sub(c)
                             if DraftVecUtils.angle(v2,v1,DraftVecUtils.neg(n)) >= 0:
                                 verts.reverse()
-                            pts =   [ifcfile.createIfcCartesianPoint(tuple(v)) for v in verts]
-                            loop =  ifcfile.createIfcPolyLoop(pts)
-                            bound = ifcfile.createIfcFaceBound(loop,True)
-                            loops.append(bound)
+                            loop =  getPolyLoop(ifcfile,verts)
+                            if loop:
+                                bound = ifcfile.createIfcFaceBound(loop,True)
+                                loops.append(bound)
                     face =  ifcfile.createIfcFace(loops)
                     faces.append(face)
 
@@ -1228,18 +1452,10 @@ def getRepresentation(ifcfile,context,obj,forcebrep=False,subtraction=False,tess
 
         if tostore:
             subrep = ifcfile.createIfcShapeRepresentation(context,'Body',solidType,shapes)
-            xvc = ifcfile.createIfcDirection((1.0,0.0,0.0))
-            zvc = ifcfile.createIfcDirection((0.0,0.0,1.0))
-            ovc = ifcfile.createIfcCartesianPoint((0.0,0.0,0.0))
-            gpl = ifcfile.createIfcAxis2Placement3D(ovc,zvc,xvc)
+            gpl = getIdentityPlacement(ifcfile)
             repmap = ifcfile.createIfcRepresentationMap(gpl,subrep)
             pla = FreeCAD.ActiveDocument.getObject(k).Placement
-            axis1 = ifcfile.createIfcDirection(tuple(pla.Rotation.multVec(FreeCAD.Vector(1,0,0))))
-            axis2 = ifcfile.createIfcDirection(tuple(pla.Rotation.multVec(FreeCAD.Vector(0,1,0))))
-            origin = ifcfile.createIfcCartesianPoint(tuple(FreeCAD.Vector(pla.Base).multiply(0.001)))
-            axis3 = ifcfile.createIfcDirection(tuple(pla.Rotation.multVec(FreeCAD.Vector(0,0,1))))
-            transf = ifcfile.createIfcCartesianTransformationOperator3D(axis1,axis2,origin,1.0,axis3)
-            mapitem = ifcfile.createIfcMappedItem(repmap,transf)
+            mapitem = getMappedItem(ifcfile,repmap,pla.Rotation,FreeCAD.Vector(pla.Base).multiply(0.001))
             shapes = [mapitem]
             sharedobjects[k] = repmap
             solidType = "MappedRepresentation"
@@ -1266,10 +1482,7 @@ def getRepresentation(ifcfile,context,obj,forcebrep=False,subtraction=False,tess
             for shape in shapes:
                 isi = ifcfile.createIfcStyledItem(shape,[psa],None)
 
-        xvc = ifcfile.createIfcDirection((1.0,0.0,0.0))
-        zvc = ifcfile.createIfcDirection((0.0,0.0,1.0))
-        ovc = ifcfile.createIfcCartesianPoint((0.0,0.0,0.0))
-        gpl = ifcfile.createIfcAxis2Placement3D(ovc,zvc,xvc)
+        gpl = getIdentityPlacement(ifcfile)
         placement = ifcfile.createIfcLocalPlacement(None,gpl)
         representation = ifcfile.createIfcShapeRepresentation(context,'Body',solidType,shapes)
         productdef = ifcfile.createIfcProductDefinitionShape(None,None,[representation])
@@ -1322,6 +1535,118 @@ def setRepresentation(representation):
     return result
     
     
+def getUnitScale(ifcfile):
+    "returns the length of the length unit of an IFC file in millimeters, or None if unknown"
+    prefixes = {None:1000.0,"MILLI":1.0,"CENTI":10.0,"DECI":100.0,"KILO":1000000.0}
+    for a in ifcfile.by_type("IfcUnitAssignment"):
+        for u in a.Units:
+            if u.is_a("IfcSIUnit") and (u.UnitType == "LENGTHUNIT"):
+                if (u.Name == "METRE") and (u.Prefix in prefixes):
+                    return prefixes[u.Prefix]
+                return None
+    return None
+
+def getAxesMatrix(origin,x,z):
+    """returns a FreeCAD matrix from an origin and the (not necessarily orthogonal)
+    x and z directions. If x is None, the IFC default is used: (1,0,0), or (0,0,1)
+    if z is parallel to it (see FirstProjAxis). Raises ValueError if the directions
+    don't define axes"""
+    z = FreeCAD.Vector(z)
+    if z.Length < 1e-9:
+        raise ValueError("Null z direction")
+    z.normalize()
+    if x is None:
+        if abs(abs(z.x)-1) < 1e-9:
+            x = FreeCAD.Vector(0,0,1)
+        else:
+            x = FreeCAD.Vector(1,0,0)
+    x = FreeCAD.Vector(x)
+    x = x.sub(FreeCAD.Vector(z).multiply(x.dot(z)))
+    if x.Length < 1e-9:
+        raise ValueError("x direction parallel to z direction")
+    x.normalize()
+    y = z.cross(x)
+    return FreeCAD.Matrix(x.x,y.x,z.x,origin.x,
+                          x.y,y.y,z.y,origin.y,
+                          x.z,y.z,z.z,origin.z,
+                          0,0,0,1)
+
+def getVector(coords):
+    "returns a FreeCAD vector from the 2 or 3 coordinates or direction ratios of an IFC point or direction"
+    return FreeCAD.Vector(tuple(coords)+(0,)*(3-len(coords)))
+
+def getPlacementMatrix(placement):
+    """getPlacementMatrix(placement): returns the FreeCAD matrix of an
+    IfcLocalPlacement (in file units), including the placements it is
+    relative to, or None if a placement is of an unsupported type"""
+    m = FreeCAD.Matrix()
+    while placement:
+        if not placement.is_a("IfcLocalPlacement"):
+            return None
+        a = placement.RelativePlacement
+        x = None
+        z = FreeCAD.Vector(0,0,1)
+        if a.is_a("IfcAxis2Placement3D") and a.Axis:
+            z = getVector(a.Axis.DirectionRatios)
+        if a.RefDirection:
+            x = getVector(a.RefDirection.DirectionRatios)
+        m = getAxesMatrix(getVector(a.Location.Coordinates),x,z).multiply(m)
+        placement = placement.PlacementRelTo
+    return m
+
+def getTargetMatrix(target):
+    """getTargetMatrix(target): returns the FreeCAD matrix of the
+    IfcCartesianTransformationOperator of an IfcMappedItem, or None if it
+    scales or mirrors the mapped geometry"""
+    if not target:
+        return FreeCAD.Matrix()
+    if target.is_a("IfcCartesianTransformationOperator3DnonUniform"):
+        return None
+    if (target.Scale != None) and (abs(target.Scale-1) > 1e-9):
+        return None
+    x = None
+    z = FreeCAD.Vector(0,0,1)
+    if hasattr(target,"Axis3") and target.Axis3:
+        z = getVector(target.Axis3.DirectionRatios)
+    if target.Axis1:
+        x = getVector(target.Axis1.DirectionRatios)
+    m = getAxesMatrix(getVector(target.LocalOrigin.Coordinates),x,z)
+    if target.Axis2:
+        # a y axis opposite to z^x mirrors the geometry
+        y = getVector(target.Axis2.DirectionRatios)
+        if y.dot(FreeCAD.Vector(m.A12,m.A22,m.A32)) < 0:
+            return None
+    return m
+
+def getMapping(product):
+    """getMapping(product): returns a (key,matrix) tuple if the geometry of the
+    product only depends on a representation that other products can share,
+    and on its placement. key identifies the shared representation (the
+    MappingSource of a mapped body, or the product representation itself)
+    and matrix is the placement of the product in file units. Products with
+    the same key have the same geometry, transformed by the matrices.
+    Returns None for other products, or if a placement has degenerate axes."""
+    if (not product.Representation) or (not product.ObjectPlacement):
+        return None
+    try:
+        m = getPlacementMatrix(product.ObjectPlacement)
+    except ValueError:
+        return None
+    if m is None:
+        return None
+    for r in product.Representation.Representations:
+        if r.RepresentationIdentifier and (r.RepresentationIdentifier.upper() == "BODY"):
+            if (len(r.Items) == 1) and r.Items[0].is_a("IfcMappedItem"):
+                try:
+                    t = getTargetMatrix(r.Items[0].MappingTarget)
+                except ValueError:
+                    return None
+                if t is None:
+                    return None
+                if len(product.Representation.Representations) == 1:
+                    return (("map",r.Items[0].MappingSource.id()),m.multiply(t))
+    return (("rep",product.Representation.id()),m)
+
 def getRotation(entity):
     "returns a FreeCAD rotation from an IfcProduct with a IfcMappedItem representation"
     try:
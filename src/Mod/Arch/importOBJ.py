@@ -21,7 +21,7 @@
 #*                                                                         *
 #***************************************************************************
 
-import FreeCAD, DraftGeomUtils, Part, Draft
+import FreeCAD, DraftGeomUtils, Part, Draft, os
 from DraftTools import translate
 
 p = Draft.precision()
@@ -29,16 +29,13 @@ p = Draft.precision()
 if open.__module__ == '__builtin__':
     pythonopen = open
 
-def findVert(aVertex,aList):
-    "finds aVertex in aList, returns index"
-    for i in range(len(aList)):
-        if ( round(aVertex.X,p) == round(aList[i].X,p) ):
-            if ( round(aVertex.Y,p) == round(aList[i].Y,p) ):
-                if ( round(aVertex.Z,p) == round(aList[i].Z,p) ):
-                    return i
+def getKey(v):
+    "returns a hashable key of a vector, rounded to the Draft precision"
+    return (round(v.x,p),round(v.y,p),round(v.z,p))
 
-def getIndices(shape,offset):
-    "returns a list with 2 lists: vertices and face indexes, offsetted with the given amount"
+def getVertsAndFaces(shape):
+    """returns a list with 3 lists: vertices (rounded coordinates), edges and
+    faces (tuples of indexes into the vertices, starting at 0)"""
     vlist = []
     elist = []
     flist = []
@@ -55,65 +52,94 @@ def getIndices(shape,offset):
             FreeCAD.Console.PrintWarning(translate("Arch","Found a shape containing curves, triangulating\n"))
             break
     if curves:
-        for v in curves[0]:
-            vlist.append(" "+str(round(v.x,p))+" "+str(round(v.y,p))+" "+str(round(v.z,p)))
-        for f in curves[1]:
-            fi = ""
-            for vi in f:
-                fi += " " + str(vi + offset)
-            flist.append(fi)
+        vlist = [getKey(v) for v in curves[0]]
+        flist = [tuple(f) for f in curves[1]]
     else:
+        # vertices with the same rounded coordinates are welded together,
+        # the first one gives the index
+        vindex = {}
+        def index(v):
+            k = getKey(v)
+            if not k in vindex:
+                vindex[k] = len(vlist)
+                vlist.append(k)
+            return vindex[k]
         for v in shape.Vertexes:
-            vlist.append(" "+str(round(v.X,p))+" "+str(round(v.Y,p))+" "+str(round(v.Z,p)))
+            index(v.Point)
         if not shape.Faces:
             for e in shape.Edges:
                 if DraftGeomUtils.geomType(e) == "Line":
-                    ei = " " + str(findVert(e.Vertexes[0],shape.Vertexes) + offset)
-                    ei += " " + str(findVert(e.Vertexes[-1],shape.Vertexes) + offset)
-                    elist.append(ei)
+                    elist.append((index(e.Vertexes[0].Point),index(e.Vertexes[-1].Point)))
         for f in shape.Faces:
             if len(f.Wires) > 1:
                 # if we have holes, we triangulate
                 tris = f.tessellate(1)
                 for fdata in tris[1]:
-                    fi = ""
-                    for vi in fdata:
-                        vdata = Part.Vertex(tris[0][vi])
-                        fi += " " + str(findVert(vdata,shape.Vertexes) + offset)
-                    flist.append(fi)
+                    flist.append(tuple([index(tris[0][vi]) for vi in fdata]))
             else:
-                fi = ""
                 # OCC vertices are unsorted. We need to sort in the right order...
                 edges = Part.__sortEdges__(f.OuterWire.Edges)
-                #print edges
-                for e in edges:
-                    #print e.Vertexes[0].Point,e.Vertexes[1].Point
-                    v = e.Vertexes[0]
-                    fi += " " + str(findVert(v,shape.Vertexes) + offset)
-                flist.append(fi)
+                flist.append(tuple([index(e.Vertexes[0].Point) for e in edges]))
+    return vlist,elist,flist
+
+def getIndices(shape,offset):
+    "returns a list with 3 lists: vertices, edge and face indexes, offsetted with the given amount"
+    vlist,elist,flist = getVertsAndFaces(shape)
+    vlist = [" "+str(v[0])+" "+str(v[1])+" "+str(v[2]) for v in vlist]
+    elist = ["".join([" "+str(i+offset) for i in e]) for e in elist]
+    flist = ["".join([" "+str(i+offset) for i in f]) for f in flist]
     return vlist,elist,flist
 
+def getObjectIndices(i):
+    """returns getVertsAndFaces of the i-th shape of exportshapes. Used by the
+    worker processes of export()"""
+    return getVertsAndFaces(exportshapes[i])
+
 def export(exportList,filename):
     "called when freecad exports a file"
-    outfile = pythonopen(filename,"wb")
-    ver = FreeCAD.Version()
-    outfile.write("# FreeCAD v" + ver[0] + "." + ver[1] + " build" + ver[2] + " Arch module\n")
-    outfile.write("# http://www.freecadweb.org\n")
-    offset = 1
+    pa = FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Arch")
+    processes = pa.GetInt("objProcesses",1)
+    objs = []
     for obj in exportList:
         if obj.isDerivedFrom("Part::Feature"):
             if obj.ViewObject.isVisible():
-                vlist,elist,flist = getIndices(obj.Shape,offset)
-                offset += len(vlist)
-                outfile.write("o " + obj.Name + "\n")
-                for v in vlist:
-                    outfile.write("v" + v + "\n")
-                for e in elist:
-                    outfile.write("l" + e + "\n")
-                for f in flist:
-                    outfile.write("f" + f + "\n")
-    outfile.close()
+                objs.append(obj)
+    # the shapes are converted in worker processes, which are forked, so
+    # they share exportshapes with this process. The results come back in
+    # order, with indexes starting at 0 for each object
+    global exportshapes
+    exportshapes = [obj.Shape for obj in objs]
+    pool = None
+    if processes > 1 and hasattr(os,"fork") and len(objs) > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap(getObjectIndices,range(len(objs)))
+        pool.close()
+    else:
+        results = (getVertsAndFaces(sh) for sh in exportshapes)
+    outfile = None
+    done = False
+    try:
+        outfile = pythonopen(filename,"wb")
+        ver = FreeCAD.Version()
+        outfile.write("# FreeCAD v" + ver[0] + "." + ver[1] + " build" + ver[2] + " Arch module\n")
+        outfile.write("# http://www.freecadweb.org\n")
+        offset = 1
+        for obj in objs:
+            vlist,elist,flist = results.next()
+            lines = ["o " + obj.Name]
+            lines.extend(["v "+str(v[0])+" "+str(v[1])+" "+str(v[2]) for v in vlist])
+            lines.extend(["l"+"".join([" "+str(i+offset) for i in e]) for e in elist])
+            lines.extend(["f"+"".join([" "+str(i+offset) for i in f]) for f in flist])
+            outfile.write("\n".join(lines) + "\n")
+            offset += len(vlist)
+        done = True
+    finally:
+        if outfile:
+            outfile.close()
+        if pool:
+            if not done:
+                pool.terminate()
+            pool.join()
+        exportshapes = []
     FreeCAD.Console.PrintMessage(translate("Arch","successfully written ")+filename+"\n")
-            
-            
-            
@@ -86,7 +86,7 @@ def getParamType(param):
     if param in ["dimsymbol","dimPrecision","dimorientation","precision","defaultWP",
                  "snapRange","gridEvery","linewidth","UiMode","modconstrain","modsnap",
                  "maxSnapEdges","modalt","HatchPatternResolution","snapStyle",
-                 "dimstyle","gridSize"]:
+                 "dimstyle","gridSize","arrayFuseProcesses"]:
         return "int"
     elif param in ["constructiongroupname","textfont","patternFile","template",
                    "snapModes","FontFile"]:
@@ -1670,6 +1670,40 @@ def getDXF(obj,direction=None):
     return result
 
 
+# SVG fragments of drawn shapes, see getSVG
+svgCache = {}
+svgCacheSize = 10000
+
+def getShapeFingerprint(sh):
+    """getShapeFingerprint(shape): returns a tuple describing the geometry of a
+    shape (bounding box, number of edges and vertices, placement), to be
+    compared along with its hashCode(), which can be reused by another shape"""
+    bb = sh.BoundBox
+    pl = sh.Placement
+    return (bb.XMin,bb.YMin,bb.ZMin,bb.XMax,bb.YMax,bb.ZMax,len(sh.Edges),len(sh.Vertexes),
+            tuple(pl.Base),tuple(pl.Rotation.Q))
+
+def getSVGCacheKey(obj,plane,linewidth,stroke,fill,lstyle):
+    """getSVGCacheKey(obj,plane,linewidth,stroke,fill,lstyle): returns the key
+    of the SVG fragment of the shape of obj in svgCache. The shape hash changes
+    when the shape is recomputed or moved. It comes from the address of the
+    shape data, which can be reused by another shape after a recompute, so a
+    fingerprint of the geometry is part of the key as well"""
+    if plane:
+        axes = (plane.u,plane.v,plane.axis)
+    elif hasattr(FreeCAD,"DraftWorkingPlane"):
+        # arcs are oriented by the working plane if no projection is given
+        axes = (FreeCAD.DraftWorkingPlane.axis,)
+    else:
+        axes = ()
+    axes = tuple([(a.x,a.y,a.z) for a in axes])
+    sh = obj.Shape
+    return (obj.Document.Name,obj.Name,sh.hashCode(),getShapeFingerprint(sh),axes,linewidth,stroke,fill,lstyle)
+
+def clearSVGCache():
+    "clearSVGCache(): empties the cache of SVG fragments used by getSVG"
+    svgCache.clear()
+
 def getSVG(obj,scale=1,linewidth=0.35,fontsize=12,fillstyle="shape color",direction=None,linestyle=None,color=None):
     '''getSVG(object,[scale], [linewidth],[fontsize],[fillstyle],[direction],[linestyle],[color]):
     returns a string containing a SVG representation of the given object,
@@ -1724,12 +1758,13 @@ def getSVG(obj,scale=1,linewidth=0.35,fontsize=12,fillstyle="shape color",direct
 
     def getPath(edges=[],wires=[],pathname=None):
         import DraftGeomUtils
-        svg = "<path "
+        # the path is built as a list of strings, joined at the end
+        svg = ["<path "]
         if pathname is None:
-            svg += 'id="%s" ' % obj.Name
+            svg.append('id="%s" ' % obj.Name)
         elif pathname != "":
-            svg += 'id="%s" ' % pathname
-        svg += ' d="'
+            svg.append('id="%s" ' % pathname)
+        svg.append(' d="')
         if not wires:
             egroups = (Part.__sortEdges__(edges),)
         else:
@@ -1749,7 +1784,7 @@ def getSVG(obj,scale=1,linewidth=0.35,fontsize=12,fillstyle="shape color",direct
                         vs.reverse()
                 if edgeindex == 0:
                     v = getProj(vs[0].Point)
-                    svg += 'M '+ str(v.x) +' '+ str(v.y) + ' '
+                    svg.append('M %s %s ' % (str(v.x),str(v.y)))
                 else:
                     if (vs[0].Point-previousvs[-1].Point).Length > 1e-6:
                         raise ValueError('edges not ordered')
@@ -1795,13 +1830,13 @@ def getSVG(obj,scale=1,linewidth=0.35,fontsize=12,fillstyle="shape color",direct
                              == (e.LastParameter > e.FirstParameter)
                     #        == (e.Orientation == "Forward")
                     for v in endpoints:
-                        svg += 'A %s %s %s %s %s %s %s ' % \
+                        svg.append('A %s %s %s %s %s %s %s ' % \
                                 (str(rx),str(ry),str(rot),\
                                 str(int(flag_large_arc)),\
-                                str(int(flag_sweep)),str(v.x),str(v.y))
+                                str(int(flag_sweep)),str(v.x),str(v.y)))
                 elif DraftGeomUtils.geomType(e) == "Line":
                     v = getProj(vs[-1].Point)
-                    svg += 'L '+ str(v.x) +' '+ str(v.y) + ' '
+                    svg.append('L %s %s ' % (str(v.x),str(v.y)))
                 else:
                     bspline=e.Curve.toBSpline(e.FirstParameter,e.LastParameter)
                     if bspline.Degree > 3 or bspline.isRational():
@@ -1814,31 +1849,31 @@ def getSVG(obj,scale=1,linewidth=0.35,fontsize=12,fillstyle="shape color",direct
                             if bezierseg.Degree>3: #should not happen
                                 raise AssertionError
                             elif bezierseg.Degree==1:
-                                svg +='L '
+                                svg.append('L ')
                             elif bezierseg.Degree==2:
-                                svg +='Q '
+                                svg.append('Q ')
                             elif bezierseg.Degree==3:
-                                svg +='C '
+                                svg.append('C ')
                             for pole in bezierseg.getPoles()[1:]:
                                 v = getProj(pole)
-                                svg += str(v.x) +' '+ str(v.y) + ' '
+                                svg.append('%s %s ' % (str(v.x),str(v.y)))
                     else: 
                         print("Debug: one edge (hash ",e.hashCode(),\
                                 ") has been discretized with parameter 0.1")
                         for linepoint in bspline.discretize(0.1)[1:]:
                             v = getProj(linepoint)
-                            svg += 'L '+ str(v.x) +' '+ str(v.y) + ' '
-            if fill != 'none': svg += 'Z '
-        svg += '" '
-        svg += 'stroke="' + stroke + '" '
-        svg += 'stroke-width="' + str(linewidth) + ' px" '
-        svg += 'style="stroke-width:'+ str(linewidth)
-        svg += ';stroke-miterlimit:4'
-        svg += ';stroke-dasharray:' + lstyle
-        svg += ';fill:' + fill
-        svg += ';fill-rule: evenodd "'
-        svg += '/>\n'
-        return svg
+                            svg.append('L %s %s ' % (str(v.x),str(v.y)))
+            if fill != 'none': svg.append('Z ')
+        svg.append('" ')
+        svg.append('stroke="' + stroke + '" ')
+        svg.append('stroke-width="' + str(linewidth) + ' px" ')
+        svg.append('style="stroke-width:'+ str(linewidth))
+        svg.append(';stroke-miterlimit:4')
+        svg.append(';stroke-dasharray:' + lstyle)
+        svg.append(';fill:' + fill)
+        svg.append(';fill-rule: evenodd "')
+        svg.append('/>\n')
+        return ''.join(svg)
 
     def getCircle(edge):
         cen = getProj(edge.Curve.Center)
@@ -2145,30 +2180,43 @@ def getSVG(obj,scale=1,linewidth=0.35,fontsize=12,fillstyle="shape color",direct
         else:
             fill = 'none'
         lstyle = getLineStyle()
-        
+
+        # the fragment only depends on the shape, the projection and the
+        # style, so it is reused as long as none of them changes
+        key = getSVGCacheKey(obj,plane,linewidth,stroke,fill,lstyle)
+        if key in svgCache:
+            return svg + svgCache[key]
+
         if len(obj.Shape.Vertexes) > 1:
+            frags = []
             wiredEdges = []
             if obj.Shape.Faces:
                 for i,f in enumerate(obj.Shape.Faces):
-                    svg += getPath(wires=f.Wires,pathname='%s_f%04d' % \
-                            (obj.Name,i))
+                    frags.append(getPath(wires=f.Wires,pathname='%s_f%04d' % \
+                            (obj.Name,i)))
                     wiredEdges.extend(f.Edges)
             else:
                 for i,w in enumerate(obj.Shape.Wires):
-                    svg += getPath(w.Edges,pathname='%s_w%04d' % \
-                            (obj.Name,i))
+                    frags.append(getPath(w.Edges,pathname='%s_w%04d' % \
+                            (obj.Name,i)))
                     wiredEdges.extend(w.Edges)
             if len(wiredEdges) != len(obj.Shape.Edges):
                 for i,e in enumerate(obj.Shape.Edges):
                     if (DraftGeomUtils.findEdge(e,wiredEdges) == None):
-                        svg += getPath([e],pathname='%s_nwe%04d' % \
-                                (obj.Name,i))
+                        frags.append(getPath([e],pathname='%s_nwe%04d' % \
+                                (obj.Name,i)))
+            frag = ''.join(frags)
+            svg += frag
         else:
             # closed circle or spline
             if isinstance(obj.Shape.Edges[0].Curve,Part.Circle):
-                svg = getCircle(obj.Shape.Edges[0])
+                frag = getCircle(obj.Shape.Edges[0])
             else:
-                svg = getPath(obj.Shape.Edges)
+                frag = getPath(obj.Shape.Edges)
+            svg += frag
+        if len(svgCache) >= svgCacheSize:
+            svgCache.clear()
+        svgCache[key] = frag
     return svg
     
 def getrgb(color,testbw=True):
@@ -4747,53 +4795,52 @@ class _Array(_DraftObject):
                 obj.Placement = pl
 
     def rectArray(self,shape,xvector,yvector,zvector,xnum,ynum,znum,fuse=False):
-        import Part
-        base = [shape.copy()]
+        placements = []
         for xcount in range(xnum):
             currentxvector=Vector(xvector).multiply(xcount)
-            if not xcount==0:
-                nshape = shape.copy()
-                nshape.translate(currentxvector)
-                base.append(nshape)
             for ycount in range(ynum):
                 currentyvector=FreeCAD.Vector(currentxvector)
                 currentyvector=currentyvector.add(Vector(yvector).multiply(ycount))
-                if not ycount==0:
-                    nshape = shape.copy()
-                    nshape.translate(currentyvector)
-                    base.append(nshape)
                 for zcount in range(znum):
                     currentzvector=FreeCAD.Vector(currentyvector)
                     currentzvector=currentzvector.add(Vector(zvector).multiply(zcount))
-                    if not zcount==0:
-                        nshape = shape.copy()
-                        nshape.translate(currentzvector)
-                        base.append(nshape)
-        if fuse and len(base) > 1:
-            return base[0].multiFuse(base[1:]).removeSplitter()
-        else:
-            return Part.makeCompound(base)
+                    placements.append(FreeCAD.Placement(currentzvector,FreeCAD.Rotation()))
+        return self.makeInstances(shape,placements,fuse)
 
     def polarArray(self,shape,center,angle,num,axis,axisvector,fuse=False):
         #print("angle ",angle," num ",num)
-        import Part
         if angle == 360:
             fraction = float(angle)/num
         else:
             if num == 0:
                 return shape
             fraction = float(angle)/(num-1)
-        base = [shape.copy()]
+        placements = [FreeCAD.Placement()]
         for i in range(num-1):
             currangle = fraction + (i*fraction)
-            nshape = shape.copy()
-            nshape.rotate(DraftVecUtils.tup(center), DraftVecUtils.tup(axis), currangle)
+            pl = FreeCAD.Placement(Vector(),FreeCAD.Rotation(axis,currangle),center)
             if axisvector:
                 if not DraftVecUtils.isNull(axisvector):
-                    nshape.translate(FreeCAD.Vector(axisvector).multiply(i+1))
+                    pl = FreeCAD.Placement(FreeCAD.Vector(axisvector).multiply(i+1),FreeCAD.Rotation()).multiply(pl)
+            placements.append(pl)
+        return self.makeInstances(shape,placements,fuse)
+
+    def makeInstances(self,shape,placements,fuse=False):
+        """makeInstances(shape,placements,[fuse]): returns a compound of
+        shape at each of the placements. The copies are located references
+        to the same geometry, not copies of it"""
+        import Part, DraftGeomUtils
+        base = []
+        for pl in placements:
+            if DraftGeomUtils.isNull(pl):
+                nshape = shape
+            else:
+                nshape = Part.makeCompound([shape])
+                nshape.Placement = pl
             base.append(nshape)
         if fuse and len(base) > 1:
-            return base[0].multiFuse(base[1:]).removeSplitter()
+            # the placements are in order, so neighbouring copies are fused together
+            return DraftGeomUtils.fuseShapes(base,processes=getParam("arrayFuseProcesses",1)).removeSplitter()
         else:
             return Part.makeCompound(base)
 
@@ -448,10 +448,10 @@ def findIntersection(edge1,edge2,infinite1=False,infinite2=False,ex1=False,ex2=F
         
 def wiresIntersect(wire1,wire2):
     "wiresIntersect(wire1,wire2): returns True if some of the edges of the wires are intersecting otherwise False"
+    edges = wire2.Edges
     for e1 in wire1.Edges:
-        for e2 in wire2.Edges:
-            if findIntersection(e1,e2,dts=False):
-                return True
+        if findIntersections(e1,edges):
+            return True
     return False
     
 def pocket2d(shape,offset):
@@ -868,53 +868,67 @@ def flattenWire(wire):
 
 
 def findWires(edgeslist):
-    '''finds connected wires in the given list of edges'''
-
-    def touches(e1,e2):
-        if len(e1.Vertexes) < 2:
-            return False
-        if len(e2.Vertexes) < 2:
-            return False
-        if DraftVecUtils.equals(e1.Vertexes[0].Point,e2.Vertexes[0].Point):
-            return True
-        if DraftVecUtils.equals(e1.Vertexes[0].Point,e2.Vertexes[-1].Point):
-            return True
-        if DraftVecUtils.equals(e1.Vertexes[-1].Point,e2.Vertexes[0].Point):
-            return True
-        if DraftVecUtils.equals(e1.Vertexes[-1].Point,e2.Vertexes[-1].Point):
-            return True
-        return False
-    
-    edges = edgeslist[:]
-    wires = []
-    lost = []
-    while edges:
-        e = edges[0]
-        if not wires:
-            # create first group
-            edges.remove(e)
-            wires.append([e])
+    '''finds connected wires in the given list of edges. The edge ends are
+    indexed in a hash of their coordinates, bucketed by the Draft precision,
+    so this takes near linear time even for large lists'''
+
+    cell = 10.0**-precision()
+    grid = {} # bucket -> [(point, vertex number)]
+    vertexEdges = [] # vertex number -> edges ending there
+
+    def vertex(point):
+        coords = (point.x,point.y,point.z)
+        key = tuple([int(math.floor(c/cell)) for c in coords])
+        # a point within precision can also be in the neighbour bucket on the near side
+        near = []
+        for k,c in zip(key,coords):
+            if c/cell-k < 0.5:
+                near.append((k,k-1))
+            else:
+                near.append((k,k+1))
+        for x in near[0]:
+            for y in near[1]:
+                for z in near[2]:
+                    for p,i in grid.get((x,y,z),()):
+                        if DraftVecUtils.equals(point,p):
+                            return i
+        i = len(vertexEdges)
+        grid.setdefault(key,[]).append((point,i))
+        vertexEdges.append([])
+        return i
+
+    ends = []
+    for n,e in enumerate(edgeslist):
+        verts = e.Vertexes
+        if len(verts) < 2:
+            ends.append(())
         else:
-            found = False
-            for w in wires:
-                if not found:
-                    for we in w:
-                        if touches(e,we):
-                            edges.remove(e)
-                            w.append(e)
-                            found = True
-                            break
-            if not found:
-                if e in lost:
-                    # we already tried this edge, and still nothing
-                    edges.remove(e)
-                    wires.append([e])
-                    lost = []
-                else:
-                    # put to the end of the list
-                    edges.remove(e)
-                    edges.append(e)
-                    lost.append(e)
+            v1 = vertex(verts[0].Point)
+            v2 = vertex(verts[-1].Point)
+            ends.append((v1,v2))
+            vertexEdges[v1].append(n)
+            if v2 != v1:
+                vertexEdges[v2].append(n)
+
+    # collect the edges connected to each not yet used edge, depth first,
+    # so each edge of a wire touches one of the edges before it
+    wires = []
+    used = [False]*len(edgeslist)
+    for n in range(len(edgeslist)):
+        if used[n]:
+            continue
+        used[n] = True
+        w = []
+        stack = [n]
+        while stack:
+            i = stack.pop()
+            w.append(edgeslist[i])
+            for v in ends[i]:
+                for j in vertexEdges[v]:
+                    if not used[j]:
+                        used[j] = True
+                        stack.append(j)
+        wires.append(w)
     nwires = []
     for w in wires:
         try:
@@ -1294,6 +1308,227 @@ def findDistance(point,edge,strict=False):
         print("DraftGeomUtils: Couldn't project point")
         return None
 
+def getSegments(edges):
+    '''getSegments(edges): returns the indices of the straight edges in the
+    given list and a list of their (x1,y1,z1,x2,y2,z2) coordinates, as used by
+    the batch functions findIntersections and findDistances'''
+    indices = []
+    coords = []
+    for i,e in enumerate(edges):
+        if geomType(e) == "Line":
+            p1 = e.Vertexes[0].Point
+            p2 = e.Vertexes[-1].Point
+            indices.append(i)
+            coords.append((p1.x,p1.y,p1.z,p2.x,p2.y,p2.z))
+    return indices,coords
+
+def _segmentIntersections(p1,p2,coords,infinite1=False,infinite2=False):
+    """returns a list of (i,Vector) for each segment i of coords crossing the
+    segment p1-p2 (or the lines, if infinite). Parallel segments only meet at
+    shared endpoints. Uses numpy when available"""
+    tol = 10**(-precision())
+    d1 = p2.sub(p1)
+    a = d1.dot(d1)
+    if not coords or a <= tol*tol:
+        return []
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    result = []
+    parallel = []
+    if numpy and len(coords) > 16:
+        c = numpy.array(coords,dtype=float)
+        q1 = c[:,0:3]
+        d2 = c[:,3:6] - q1
+        v1 = numpy.array((d1.x,d1.y,d1.z))
+        r = numpy.array((p1.x,p1.y,p1.z)) - q1
+        b = d2.dot(v1)
+        cc = (d2*d2).sum(axis=1)
+        d = r.dot(v1)
+        e = (d2*r).sum(axis=1)
+        denom = a*cc - b*b
+        para = denom <= 1e-12*a*cc
+        denom[para] = 1
+        s1 = (b*e - cc*d)/denom
+        s2 = (a*e - b*d)/denom
+        pts1 = numpy.array((p1.x,p1.y,p1.z)) + numpy.outer(s1,v1)
+        pts2 = q1 + d2*s2[:,None]
+        ok = (~para) & (((pts1-pts2)**2).sum(axis=1) <= tol*tol)
+        ptol1 = tol/math.sqrt(a)
+        ptol2 = tol/numpy.sqrt(numpy.maximum(cc,tol*tol))
+        if not infinite1:
+            ok &= (s1 >= -ptol1) & (s1 <= 1+ptol1)
+        if not infinite2:
+            ok &= (s2 >= -ptol2) & (s2 <= 1+ptol2)
+        for i in numpy.nonzero(ok)[0]:
+            result.append((int(i),Vector(tuple(pts1[i]))))
+        parallel = [int(i) for i in numpy.nonzero(para)[0]]
+    else:
+        for i,(x1,y1,z1,x2,y2,z2) in enumerate(coords):
+            dx,dy,dz = x2-x1,y2-y1,z2-z1
+            rx,ry,rz = p1.x-x1,p1.y-y1,p1.z-z1
+            b = d1.x*dx+d1.y*dy+d1.z*dz
+            cc = dx*dx+dy*dy+dz*dz
+            d = rx*d1.x+ry*d1.y+rz*d1.z
+            e = rx*dx+ry*dy+rz*dz
+            denom = a*cc - b*b
+            if denom <= 1e-12*a*cc:
+                parallel.append(i)
+                continue
+            s1 = (b*e - cc*d)/denom
+            s2 = (a*e - b*d)/denom
+            pt1 = Vector(p1.x+s1*d1.x,p1.y+s1*d1.y,p1.z+s1*d1.z)
+            if (pt1.x-x1-s2*dx)**2+(pt1.y-y1-s2*dy)**2+(pt1.z-z1-s2*dz)**2 > tol*tol:
+                continue
+            ptol1 = tol/math.sqrt(a)
+            ptol2 = tol/math.sqrt(max(cc,tol*tol))
+            if (not infinite1) and (s1 < -ptol1 or s1 > 1+ptol1):
+                continue
+            if (not infinite2) and (s2 < -ptol2 or s2 > 1+ptol2):
+                continue
+            result.append((i,pt1))
+    for i in parallel:
+        q1 = Vector(coords[i][0:3])
+        q2 = Vector(coords[i][3:6])
+        for p in [p1,p2]:
+            if DraftVecUtils.equals(p,q1) or DraftVecUtils.equals(p,q2):
+                result.append((i,p))
+                break
+    result.sort(key=lambda r: r[0])
+    return result
+
+def findIntersections(edge,edges,infinite1=False,infinite2=False,dts=False):
+    '''findIntersections(edge,edges,[infinite1],[infinite2],[dts]): returns a list
+    of (index,point) for all the intersection points of edge with the edges of
+    the given list, like findIntersection(edge,e,infinite1,infinite2,dts) for
+    each of them. Pairs of straight edges are solved all at once (with numpy if
+    available), others one by one. dts only applies to the pairs involving a
+    curve: straight pairs always give their true intersection only, while
+    distToShape also returns the closest points of edges that don't touch.'''
+    result = []
+    indices,coords = getSegments(edges)
+    done = set(indices)
+    if geomType(edge) == "Line":
+        p1 = edge.Vertexes[0].Point
+        p2 = edge.Vertexes[-1].Point
+        for i,pt in _segmentIntersections(p1,p2,coords,infinite1,infinite2):
+            result.append((indices[i],pt))
+    else:
+        done = set()
+    for i,e in enumerate(edges):
+        if not i in done:
+            for pt in findIntersection(edge,e,infinite1,infinite2,dts=dts):
+                result.append((i,pt))
+    result.sort(key=lambda r: r[0])
+    return result
+
+def findDistances(point,edges,strict=False):
+    '''findDistances(vector,edges,[strict]): returns a list with, for each edge
+    of the given list, what findDistance(point,edge,strict) returns: a vector
+    from the point to its closest point on the edge, or None. Straight edges are
+    solved all at once (with numpy if available), others one by one.'''
+    result = [None]*len(edges)
+    indices,coords = getSegments(edges)
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    if numpy and len(coords) > 16:
+        c = numpy.array(coords,dtype=float)
+        q1 = c[:,0:3]
+        d2 = c[:,3:6] - q1
+        cc = (d2*d2).sum(axis=1)
+        cc[cc == 0] = 1
+        t = ((numpy.array((point.x,point.y,point.z)) - q1)*d2).sum(axis=1)/cc
+        dist = q1 + d2*t[:,None] - numpy.array((point.x,point.y,point.z))
+        for n,i in enumerate(indices):
+            if strict and (t[n] < 0 or t[n] > 1):
+                continue
+            v = Vector(tuple(dist[n]))
+            if v.Length != 0:
+                result[i] = v
+    else:
+        for n,i in enumerate(indices):
+            x1,y1,z1,x2,y2,z2 = coords[n]
+            dx,dy,dz = x2-x1,y2-y1,z2-z1
+            cc = (dx*dx+dy*dy+dz*dz) or 1
+            t = ((point.x-x1)*dx+(point.y-y1)*dy+(point.z-z1)*dz)/cc
+            if strict and (t < 0 or t > 1):
+                continue
+            v = Vector(x1+t*dx-point.x,y1+t*dy-point.y,z1+t*dz-point.z)
+            if v.Length != 0:
+                result[i] = v
+    done = set(indices)
+    for i,e in enumerate(edges):
+        if not i in done:
+            result[i] = findDistance(point,e,strict)
+    return result
+
+def isPtOnEdges(pt,edges):
+    '''isPtOnEdges(vector,edges): returns a list with, for each edge of the given
+    list, what isPtOnEdge(pt,edge) returns. Straight edges are solved all at once
+    (with numpy if available), others one by one.'''
+    tol = 10**(-precision())
+    result = [False]*len(edges)
+    indices,coords = getSegments(edges)
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    if numpy and len(coords) > 16:
+        c = numpy.array(coords,dtype=float)
+        q1 = c[:,0:3]
+        d2 = c[:,3:6] - q1
+        cc = (d2*d2).sum(axis=1)
+        cc[cc == 0] = 1
+        p = numpy.array((pt.x,pt.y,pt.z))
+        t = numpy.clip(((p - q1)*d2).sum(axis=1)/cc,0,1)
+        dist = numpy.sqrt(((q1 + d2*t[:,None] - p)**2).sum(axis=1))
+        for n,i in enumerate(indices):
+            result[i] = round(dist[n],precision()) == 0
+    else:
+        for n,i in enumerate(indices):
+            x1,y1,z1,x2,y2,z2 = coords[n]
+            dx,dy,dz = x2-x1,y2-y1,z2-z1
+            cc = (dx*dx+dy*dy+dz*dz) or 1
+            t = min(1,max(0,((pt.x-x1)*dx+(pt.y-y1)*dy+(pt.z-z1)*dz)/cc))
+            dist = math.sqrt((x1+t*dx-pt.x)**2+(y1+t*dy-pt.y)**2+(z1+t*dz-pt.z)**2)
+            result[i] = round(dist,precision()) == 0
+    done = set(indices)
+    for i,e in enumerate(edges):
+        if not i in done:
+            result[i] = isPtOnEdge(pt,e)
+    return result
+
+def findClosestPoints(basepoints,pointslist):
+    '''findClosestPoints(vectors,list): returns, for each of the given base
+    points, the index of the closest point of the list, like findClosest.
+    Uses numpy when available.'''
+    if not pointslist: return [None]*len(basepoints)
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    if numpy and len(basepoints)*len(pointslist) > 256:
+        pts = numpy.array([(p.x,p.y,p.z) for p in pointslist],dtype=float)
+        result = []
+        for b in basepoints:
+            d = ((pts - numpy.array((b.x,b.y,b.z)))**2).sum(axis=1)
+            result.append(int(d.argmin()))
+        return result
+    coords = [(p.x,p.y,p.z) for p in pointslist]
+    result = []
+    for b in basepoints:
+        bx,by,bz = b.x,b.y,b.z
+        smallest = None
+        for n,(x,y,z) in enumerate(coords):
+            d = (x-bx)**2+(y-by)**2+(z-bz)**2
+            if smallest is None or d < smallest:
+                smallest = d
+                npoint = n
+        result.append(npoint)
+    return result
 
 def angleBisection(edge1, edge2):
     "angleBisection(edge,edge) - Returns an edge that bisects the angle between the 2 edges."
@@ -1531,6 +1766,54 @@ def cleanFaces(shape):
         return fshape
 
 
+def _fuseGroup(shapes):
+    "fuses a list of shapes, or returns the only one"
+    if len(shapes) == 1:
+        return shapes[0]
+    return shapes[0].multiFuse(shapes[1:])
+
+def _fuseBreps(breps):
+    "worker of fuseShapes: fuses a list of shapes given as brep strings"
+    shapes = []
+    for b in breps:
+        sh = Part.Shape()
+        sh.importBrepFromString(b)
+        shapes.append(sh)
+    return _fuseGroup(shapes).exportBrepToString()
+
+def fuseShapes(shapes,chunk=8,processes=None):
+    '''fuseShapes(shapes,[chunk],[processes]): fuses a list of shapes by
+    fusing groups of chunk neighbouring shapes, then groups of these results,
+    and so on, which is much faster than fusing all of them at once when there
+    are many. The list should be ordered so that neighbours in it are close in
+    space. If processes is more than 1, the groups of each level are fused by
+    that many worker processes (only on systems where processes can be forked)'''
+    import os
+    shapes = list(shapes)
+    if not shapes:
+        return None
+    pool = None
+    if processes and processes > 1 and hasattr(os,"fork") and len(shapes) > chunk:
+        import multiprocessing
+        pool = multiprocessing.Pool(processes)
+    try:
+        while len(shapes) > 1:
+            groups = [shapes[i:i+chunk] for i in range(0,len(shapes),chunk)]
+            if pool and len(groups) > 1:
+                breps = pool.map(_fuseBreps,[[sh.exportBrepToString() for sh in g] for g in groups])
+                shapes = []
+                for b in breps:
+                    sh = Part.Shape()
+                    sh.importBrepFromString(b)
+                    shapes.append(sh)
+            else:
+                shapes = [_fuseGroup(g) for g in groups]
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    return shapes[0]
+
 def isCubic(shape):
     '''isCubic(shape): verifies if a shape is cubic, that is, has
     8 vertices, 6 faces, and all angles are 90 degrees.'''
@@ -31,6 +31,73 @@ from FreeCAD import Vector
 from pivy import coin
 from PySide import QtCore,QtGui
 
+class EdgeIndex:
+    """A grid of the bounding boxes of the edges of a shape, used by the
+    Snapper to find the edges near a given box without testing all of them.
+    Midpoints are computed once per edge, when first asked for."""
+
+    def __init__(self,shape):
+        self.edges = shape.Edges
+        self.boxes = []
+        for e in self.edges:
+            b = e.BoundBox
+            self.boxes.append((b.XMin,b.YMin,b.ZMin,b.XMax,b.YMax,b.ZMax))
+        self.midpoints = {}
+        # cell -> indices of the edges whose box crosses it
+        self.cells = {}
+        # edges crossing too many cells, always returned
+        self.large = []
+        bb = shape.BoundBox
+        size = max(bb.XLength,bb.YLength,bb.ZLength)
+        if self.edges and size > 0:
+            self.size = size/math.sqrt(len(self.edges))
+        else:
+            self.size = 1
+        for i,b in enumerate(self.boxes):
+            keys = self.getCells(b)
+            if keys is None:
+                self.large.append(i)
+            else:
+                for k in keys:
+                    if k in self.cells:
+                        self.cells[k].append(i)
+                    else:
+                        self.cells[k] = [i]
+
+    def getCells(self,box,maxcells=64):
+        "returns the cells crossed by a (xmin,ymin,zmin,xmax,ymax,zmax) box, or None if more than maxcells"
+        x0,y0,z0,x1,y1,z1 = [int(math.floor(c/self.size)) for c in box]
+        if (x1-x0+1)*(y1-y0+1)*(z1-z0+1) > maxcells:
+            return None
+        return [(x,y,z) for x in range(x0,x1+1) for y in range(y0,y1+1) for z in range(z0,z1+1)]
+
+    def getEdges(self,boundbox,tolerance=0):
+        "returns the indices of the edges whose bounding box intersects the given BoundBox"
+        box = (boundbox.XMin-tolerance,boundbox.YMin-tolerance,boundbox.ZMin-tolerance,
+               boundbox.XMax+tolerance,boundbox.YMax+tolerance,boundbox.ZMax+tolerance)
+        keys = self.getCells(box)
+        if keys is None:
+            candidates = range(len(self.edges))
+        else:
+            candidates = set(self.large)
+            for k in keys:
+                if k in self.cells:
+                    candidates.update(self.cells[k])
+            candidates = sorted(candidates)
+        result = []
+        for i in candidates:
+            b = self.boxes[i]
+            if b[0] <= box[3] and b[3] >= box[0] and b[1] <= box[4] and b[4] >= box[1] and b[2] <= box[5] and b[5] >= box[2]:
+                result.append(i)
+        return result
+
+    def getMidpoint(self,i):
+        "returns the midpoint of edge i"
+        if not i in self.midpoints:
+            self.midpoints[i] = DraftGeomUtils.findMidpoint(self.edges[i])
+        return self.midpoints[i]
+
+
 class Snapper:
     """The Snapper objects contains all the functionality used by draft
     and arch module to manage object snapping. It is responsible for
@@ -80,6 +147,8 @@ class Snapper:
         self.active = True
         self.forceGridOff = False
         self.lastExtensions = []
+        # (document,object) name -> ((shape hash, fingerprint), EdgeIndex) of the last snapped objects
+        self.edgeIndexes = {}
         # the trackers are stored in lists because there can be several views, each with its own set
         self.trackers = [[],[],[],[],[],[],[],[],[]] # view, grid, snap, extline, radius, dim1, dim2, trackLine, extline2
         self.polarAngles = [90,45]
@@ -297,37 +366,37 @@ class Snapper:
                         # special snapping for polygons: add the center
                         snaps.extend(self.snapToPolygon(obj))
                         
-                    if (not self.maxEdges) or (len(obj.Edges) <= self.maxEdges):
-                        if "Edge" in comp:
-                            # we are snapping to an edge
-                            en = int(comp[4:])-1
-                            if len(obj.Shape.Edges) > en:
-                                edge = obj.Shape.Edges[en]
-                                snaps.extend(self.snapToEndpoints(edge))
-                                snaps.extend(self.snapToMidpoint(edge))
-                                snaps.extend(self.snapToPerpendicular(edge,lastpoint))
-                                #snaps.extend(self.snapToOrtho(edge,lastpoint,constrain)) # now part of snapToPolar
-                                snaps.extend(self.snapToIntersection(edge))
-                                snaps.extend(self.snapToElines(edge,eline))
-                                
-                                et = DraftGeomUtils.geomType(edge)
-                                if et == "Circle":
-                                    # the edge is an arc, we have extra options
-                                    snaps.extend(self.snapToAngles(edge))
-                                    snaps.extend(self.snapToCenter(edge))
-                                elif et == "Ellipse":
-                                    # extra ellipse options
-                                    snaps.extend(self.snapToCenter(edge))
-
-                        elif "Vertex" in comp:
-                            # directly snapped to a vertex
-                            snaps.append(self.snapToVertex(self.snapInfo,active=True))
-                        elif comp == '':
-                            # workaround for the new view provider
-                            snaps.append(self.snapToVertex(self.snapInfo,active=True))
-                        else:
-                            # all other cases (face, etc...) default to passive snap
-                            snapArray = [self.snapToVertex(self.snapInfo)]
+                    if "Edge" in comp:
+                        # we are snapping to an edge
+                        en = int(comp[4:])-1
+                        index = self.getEdgeIndex(obj)
+                        if len(index.edges) > en:
+                            edge = index.edges[en]
+                            snaps.extend(self.snapToEndpoints(edge))
+                            snaps.extend(self.snapToMidpoint(edge,index.getMidpoint(en)))
+                            snaps.extend(self.snapToPerpendicular(edge,lastpoint))
+                            #snaps.extend(self.snapToOrtho(edge,lastpoint,constrain)) # now part of snapToPolar
+                            snaps.extend(self.snapToIntersection(edge))
+                            snaps.extend(self.snapToElines(edge,eline))
+                            
+                            et = DraftGeomUtils.geomType(edge)
+                            if et == "Circle":
+                                # the edge is an arc, we have extra options
+                                snaps.extend(self.snapToAngles(edge))
+                                snaps.extend(self.snapToCenter(edge))
+                            elif et == "Ellipse":
+                                # extra ellipse options
+                                snaps.extend(self.snapToCenter(edge))
+
+                    elif "Vertex" in comp:
+                        # directly snapped to a vertex
+                        snaps.append(self.snapToVertex(self.snapInfo,active=True))
+                    elif comp == '':
+                        # workaround for the new view provider
+                        snaps.append(self.snapToVertex(self.snapInfo,active=True))
+                    else:
+                        # all other cases (face, etc...) default to passive snap
+                        snapArray = [self.snapToVertex(self.snapInfo)]
                             
                 elif Draft.getType(obj) == "Dimension":
                     # for dimensions we snap to their 2 points:
@@ -407,6 +476,22 @@ class Snapper:
             # return the final point
             return fp
 
+    def getEdgeIndex(self,obj):
+        """returns the EdgeIndex of the shape of obj, built again only if the shape
+        changed. The shape hash can be reused by a new shape after a recompute,
+        so the geometry fingerprint of the shape is compared as well"""
+        key = (obj.Document.Name,obj.Name)
+        shape = obj.Shape
+        h = (shape.hashCode(),Draft.getShapeFingerprint(shape))
+        if key in self.edgeIndexes:
+            if self.edgeIndexes[key][0] == h:
+                return self.edgeIndexes[key][1]
+        if len(self.edgeIndexes) > 16:
+            self.edgeIndexes = {}
+        index = EdgeIndex(shape)
+        self.edgeIndexes[key] = (h,index)
+        return index
+
     def toWP(self,point):
         "projects the given point on the working plane, if needed"
         if self.isEnabled("WorkingPlane"):
@@ -464,7 +549,7 @@ class Snapper:
                 ob = FreeCAD.ActiveDocument.getObject(o)
                 if ob:
                     if ob.isDerivedFrom("Part::Feature"):
-                        edges = ob.Shape.Edges
+                        edges = list(self.getEdgeIndex(ob).edges)
                         if Draft.getType(ob) == "Wall":
                             for so in [ob]+ob.Additions:
                                 if Draft.getType(so) == "Wall":
@@ -627,12 +712,13 @@ class Snapper:
                         snaps.append([v,'endpoint',self.toWP(v)])
         return snaps
 
-    def snapToMidpoint(self,shape):
-        "returns a list of midpoints snap locations"
+    def snapToMidpoint(self,shape,mp=None):
+        "returns a list of midpoints snap locations (mp is the midpoint of shape, if already known)"
         snaps = []
         if self.isEnabled("midpoint"):
             if isinstance(shape,Part.Edge):
-                mp = DraftGeomUtils.findMidpoint(shape)
+                if mp is None:
+                    mp = DraftGeomUtils.findMidpoint(shape)
                 if mp:
                     snaps.append([mp,'midpoint',self.toWP(mp)])
         return snaps
@@ -758,13 +844,14 @@ class Snapper:
                 obj = FreeCAD.ActiveDocument.getObject(self.lastObj[0])
                 if obj:
                     if obj.isDerivedFrom("Part::Feature"):
-                        if (not self.maxEdges) or (len(obj.Shape.Edges) <= self.maxEdges):
-                            for e in obj.Shape.Edges:
-                                # get the intersection points
-                                pt = DraftGeomUtils.findIntersection(e,shape)
-                                if pt:
-                                    for p in pt:
-                                        snaps.append([p,'intersection',self.toWP(p)])
+                        # only the edges whose bounding box meets the one of shape can intersect it
+                        index = self.getEdgeIndex(obj)
+                        near = index.getEdges(shape.BoundBox,Draft.tolerance())
+                        if (not self.maxEdges) or (len(near) <= self.maxEdges):
+                            # get the intersection points
+                            edges = [index.edges[i] for i in near]
+                            for i,p in DraftGeomUtils.findIntersections(shape,edges,dts=True):
+                                snaps.append([p,'intersection',self.toWP(p)])
         return snaps
         
     def snapToPolygon(self,obj):
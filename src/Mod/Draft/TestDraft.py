@@ -132,6 +132,60 @@ class DraftTest(unittest.TestCase):
         r2 = Draft.offset(r,FreeCAD.Vector(-1,-1,0),copy=True)
         self.failUnless(r2,"Draft Offset failed")
 
+    def testFindWires(self):
+        FreeCAD.Console.PrintLog ('Checking Draft findWires...\n')
+        import Part, DraftGeomUtils
+        v = FreeCAD.Vector
+        # two separate paths, given out of order and with one reversed edge
+        edges = [Part.makeLine(v(1,0,0),v(1,1,0)),
+                 Part.makeLine(v(5,0,0),v(6,0,0)),
+                 Part.makeLine(v(0,1,0),v(1,1,0)),
+                 Part.makeLine(v(0,0,0),v(1,0,0)),
+                 Part.makeLine(v(6,0,0),v(6,1,0))]
+        wires = DraftGeomUtils.findWires(edges)
+        self.failUnless(sorted([len(w.Edges) for w in wires]) == [2,3],"Draft findWires failed")
+
+    def testFindIntersections(self):
+        FreeCAD.Console.PrintLog ('Checking Draft findIntersections...\n')
+        import Part, DraftGeomUtils, DraftVecUtils
+        v = FreeCAD.Vector
+        edge = Part.makeLine(v(0,0,0),v(10,0,0))
+        edges = [Part.makeLine(v(i,-1,0),v(i,1,0)) for i in range(20)]
+        edges.append(Part.makeCircle(1,v(5,0,0)))
+        pts = DraftGeomUtils.findIntersections(edge,edges)
+        self.failUnless(len(pts) == 13,"Draft findIntersections failed")
+        self.failUnless(pts[3][0] == 3 and DraftVecUtils.equals(pts[3][1],v(3,0,0)),"Draft findIntersections failed")
+        on = DraftGeomUtils.isPtOnEdges(v(3,0.5,0),edges)
+        self.failUnless(on == [DraftGeomUtils.isPtOnEdge(v(3,0.5,0),e) for e in edges],"Draft isPtOnEdges failed")
+        self.failUnless(on.count(True) == 1 and on[3],"Draft isPtOnEdges failed")
+        pts = [v(i,i,0) for i in range(30)]
+        base = [v(4.2,3.9,0),v(-5,0,0),v(100,100,0)]
+        self.failUnless(DraftGeomUtils.findClosestPoints(base,pts) == [DraftGeomUtils.findClosest(b,pts) for b in base],"Draft findClosestPoints failed")
+
+    def testSnapperEdgeIndex(self):
+        FreeCAD.Console.PrintLog ('Checking Draft Snapper edge index...\n')
+        import DraftSnap, DraftVecUtils
+        snapper = DraftSnap.Snapper()
+        line = Draft.makeLine(FreeCAD.Vector(0,0,0),FreeCAD.Vector(2,0,0))
+        FreeCAD.ActiveDocument.recompute()
+        edges = snapper.getEdgeIndex(line).edges
+        self.failUnless(DraftVecUtils.equals(edges[0].Vertexes[-1].Point,FreeCAD.Vector(2,0,0)),"Draft Snapper edge index failed")
+        line.End = FreeCAD.Vector(2,3,0)
+        FreeCAD.ActiveDocument.recompute()
+        edges = snapper.getEdgeIndex(line).edges
+        self.failUnless(DraftVecUtils.equals(edges[0].Vertexes[-1].Point,FreeCAD.Vector(2,3,0)),"Draft Snapper edge index not updated")
+
+    def testFuseShapes(self):
+        FreeCAD.Console.PrintLog ('Checking Draft fuseShapes...\n')
+        import Part, DraftGeomUtils
+        boxes = []
+        for i in range(20):
+            b = Part.makeBox(2,2,2)
+            b.translate(FreeCAD.Vector(i,0,0))
+            boxes.append(b)
+        sh = DraftGeomUtils.fuseShapes(boxes,chunk=3)
+        self.failUnless(abs(sh.Volume-84) < 1e-6,"Draft fuseShapes failed")
+
     # modification tools
 
     def tearDown(self):
@@ -139,4 +193,29 @@ class DraftTest(unittest.TestCase):
         pass
 
 
-
+def benchmarkArrayFuse(number=10,processes=4):
+    """benchmarkArrayFuse([number],[processes]): prints the time taken to fuse
+    a rectangular array of number x number cylinders and a polar array of as
+    many cylinders, at once like before, in chunks, and in chunks fused by
+    processes worker processes"""
+    import time, Part, DraftGeomUtils
+    cyl = Part.makeCylinder(1,1)
+    rect = []
+    polar = []
+    for i in range(number*number):
+        sh = cyl.copy()
+        sh.translate(FreeCAD.Vector(1.5*(i//number),1.5*(i%number),0))
+        rect.append(sh)
+        sh = cyl.copy()
+        sh.rotate(FreeCAD.Vector(0,-number,0),FreeCAD.Vector(0,0,1),360.0*i/(number*number))
+        polar.append(sh)
+    for name,shapes in [("rectangular",rect),("polar",polar)]:
+        t = time.time()
+        shapes[0].multiFuse(shapes[1:]).removeSplitter()
+        print("%s array of %d: multiFuse %.2fs" % (name,len(shapes),time.time()-t))
+        t = time.time()
+        DraftGeomUtils.fuseShapes(shapes).removeSplitter()
+        print("%s array of %d: fuseShapes %.2fs" % (name,len(shapes),time.time()-t))
+        t = time.time()
+        DraftGeomUtils.fuseShapes(shapes,processes=processes).removeSplitter()
+        print("%s array of %d: fuseShapes with %d processes %.2fs" % (name,len(shapes),processes,time.time()-t))
@@ -301,7 +301,10 @@ def isBrightBackground():
 
 def getGroupColor(dxfobj,index=False):
     "get color of bylayer stuff"
-    name = dxfobj.layer
+    return getLayerColor(dxfobj.layer,index)
+
+def getLayerColor(name,index=False):
+    "get the color of the layer with the given name"
     for table in drawing.tables.get_type("table"):
         if table.name == "layer":
             for l in table.get_type("layer"):
@@ -482,7 +485,7 @@ def drawCircle(circle,forceShape=False):
         warn(circle)
     return None
 
-def drawEllipse(ellipse):
+def drawEllipse(ellipse,forceShape=False):
     "returns a Part shape from a dxf arc"
     try:
         c = vec(ellipse.loc)
@@ -841,17 +844,16 @@ def drawInsert(insert,num=None,clone=False):
         else:
             shape = None
     else:
-        if insert in blockshapes:
-            shape = blockshapes[insert.block].copy()
-        else:
-            shape = None
-            for b in drawing.blocks.data:
-                if b.name == insert.block:
-                    shape = drawBlock(b,num)
+        shape = getBlockShape(insert.block,num)
         if shape:
             pos = vec(insert.loc)
-            rot = math.radians(insert.rotation)
             scale = insert.scale
+            if (scale[0] == 1) and (scale[1] == 1):
+                # only placed, the new compound shares the geometry of the block
+                shape = Part.makeCompound([shape])
+                shape.Placement = FreeCAD.Placement(pos,FreeCAD.Rotation(Vector(0,0,1),insert.rotation))
+                return shape
+            rot = math.radians(insert.rotation)
             tsf = FreeCAD.Matrix()
             tsf.scale(scale[0],scale[1],0) # for some reason z must be 0 to work
             tsf.rotateZ(rot)
@@ -860,20 +862,55 @@ def drawInsert(insert,num=None,clone=False):
             return shape
     return None
 
-def drawLayerBlock(objlist):
-    "draws a Draft block with the given shapes or objects"
-    obj = None
-    if (dxfCreateDraft or dxfCreateSketch):
+def getBlockShape(name,num=None):
+    "returns the shape of a block, drawn only the first time it is needed"
+    if not name in blockshapes:
+        blockshapes[name] = None # stays None if the block can't be drawn
+        if name in blockdefs:
+            drawBlock(blockdefs[name],num)
+    return blockshapes[name]
+
+def drawLayerBlock(shapes,layer):
+    """returns the objects made of the given shapes of a layer: a Part compound,
+    or a sketch, plus a Part compound of the edges a sketch can't hold (splines...)"""
+    objs = []
+    if dxfCreateSketch:
+        geoms = []
+        others = []
+        for s in shapes:
+            for e in s.Edges:
+                g = DraftGeomUtils.geom(e)
+                if isinstance(g,(Part.Line,Part.Circle,Part.ArcOfCircle,Part.Ellipse,Part.ArcOfEllipse)):
+                    geoms.append(g)
+                else:
+                    others.append(e)
+        if geoms:
+            obj = doc.addObject("Sketcher::SketchObject",layer)
+            # all at once, adding them one by one solves the sketch each time
+            obj.addGeometry(geoms)
+            objs.append(obj)
+        shapes = others
+    if shapes:
         try:
-            obj = Draft.makeBlock(objlist)
+            shape = Part.makeCompound(shapes)
         except Part.OCCError:
-            pass
+            warn(layer)
+        else:
+            obj = doc.addObject("Part::Feature",layer)
+            obj.Shape = shape
+            objs.append(obj)
+    return objs
+
+def formatLayerObject(obj,layer):
+    "applies the color of a layer to the object holding its geometry"
+    if dxfGetColors:
+        cm = getLayerColor(layer)
     else:
-        try:
-            obj = Part.makeCompound(objlist)
-        except Part.OCCError:
-            pass
-    return obj
+        cm = dxfDefaultColor
+    if hasattr(obj.ViewObject,"LineColor"):
+        obj.ViewObject.LineColor = (cm[0],cm[1],cm[2],0.0)
+    if hasattr(obj.ViewObject,"PointColor"):
+        obj.ViewObject.PointColor = (cm[0],cm[1],cm[2],0.0)
 
 def attribs(insert):
     "checks if an insert has attributes, and returns the values if yes"
@@ -1000,6 +1037,10 @@ def processdxf(document,filename,getShapes=False):
     doc = document
     global blockshapes
     blockshapes = {}
+    global blockdefs
+    blockdefs = {}
+    for b in drawing.blocks.data:
+        blockdefs[b.name] = b
     global blockobjects
     blockobjects = {}
     global badobjects
@@ -1008,6 +1049,12 @@ def processdxf(document,filename,getShapes=False):
     layerBlocks = {}
     sketch = None
     shapes = []
+    # with "group layers into blocks", entities are only drawn as shapes and
+    # collected per layer, instead of creating (and formatting) a document
+    # object for each of them. If joining is enabled, lines, polylines and arcs
+    # are joined across layers instead and not collected.
+    batch = dxfMakeBlocks and not getShapes
+    batchEdges = batch and not dxfJoin
 
     # drawing lines
 
@@ -1015,9 +1062,11 @@ def processdxf(document,filename,getShapes=False):
     if lines: FreeCAD.Console.PrintMessage("drawing "+str(len(lines))+" lines...\n")
     for line in lines:
         if dxfImportLayouts or (not rawValue(line,67)):
-            shape = drawLine(line)
+            shape = drawLine(line,forceShape=batchEdges)
             if shape:
-                if dxfCreateSketch:
+                if batchEdges:
+                    addToBlock(shape,line.layer)
+                elif dxfCreateSketch:
                     if dxfMakeBlocks or dxfJoin:
                         if sketch:
                             shape = Draft.makeSketch(shape,autoconstraints=True,addTo=sketch)
@@ -1031,8 +1080,6 @@ def processdxf(document,filename,getShapes=False):
                         shapes.append(shape)
                     else:
                         shapes.append(shape.Shape)
-                elif dxfMakeBlocks:
-                    addToBlock(shape,line.layer)
                 else:
                     newob = addObject(shape,"Line",line.layer)
                     if gui: formatObject(newob,line)
@@ -1056,9 +1103,11 @@ def processdxf(document,filename,getShapes=False):
     num = 0
     for polyline in polylines:
         if dxfImportLayouts or (not rawValue(polyline,67)):
-            shape = drawPolyline(polyline,num)
+            shape = drawPolyline(polyline,batchEdges,num)
             if shape:
-                if dxfCreateSketch:
+                if batchEdges:
+                    addToBlock(shape,polyline.layer)
+                elif dxfCreateSketch:
                     if isinstance(shape,Part.Shape):
                         t = FreeCAD.ActiveDocument.addObject("Part::Feature","Shape")
                         t.Shape = shape
@@ -1076,8 +1125,6 @@ def processdxf(document,filename,getShapes=False):
                         shapes.append(shape)
                     else:
                         shapes.append(shape.Shape)
-                elif dxfMakeBlocks:
-                    addToBlock(shape,polyline.layer)
                 else:
                     newob = addObject(shape,"Polyline",polyline.layer)
                     if gui: formatObject(newob,polyline)
@@ -1089,9 +1136,11 @@ def processdxf(document,filename,getShapes=False):
     if arcs: FreeCAD.Console.PrintMessage("drawing "+str(len(arcs))+" arcs...\n")
     for arc in arcs:
         if dxfImportLayouts or (not rawValue(arc,67)):
-            shape = drawArc(arc)
+            shape = drawArc(arc,forceShape=batchEdges)
             if shape:
-                if dxfCreateSketch:
+                if batchEdges:
+                    addToBlock(shape,arc.layer)
+                elif dxfCreateSketch:
                     if dxfMakeBlocks or dxfJoin:
                         if sketch:
                             shape = Draft.makeSketch(shape,autoconstraints=True,addTo=sketch)
@@ -1105,8 +1154,6 @@ def processdxf(document,filename,getShapes=False):
                         shapes.append(shape)
                     else:
                         shapes.append(shape.Shape)
-                elif dxfMakeBlocks:
-                    addToBlock(shape,arc.layer)
                 else:
                     newob = addObject(shape,"Arc",arc.layer)
                     if gui: formatObject(newob,arc)
@@ -1118,18 +1165,7 @@ def processdxf(document,filename,getShapes=False):
         edges = []
         for s in shapes:
             edges.extend(s.Edges)
-        if len(edges) > (100):
-            FreeCAD.Console.PrintMessage(str(len(edges))+" edges to join\n")
-            from PySide import QtGui
-            d = QtGui.QMessageBox()
-            d.setText("Warning: High number of entities to join (>100)")
-            d.setInformativeText("This might take a long time or even freeze your computer. Are you sure? You can also disable the \"join geometry\" setting in DXF import preferences")
-            d.setStandardButtons(QtGui.QMessageBox.Ok | QtGui.QMessageBox.Cancel)
-            d.setDefaultButton(QtGui.QMessageBox.Cancel)
-            res = d.exec_()
-            if res == QtGui.QMessageBox.Cancel:
-                FreeCAD.Console.PrintMessage("Aborted\n")
-                return
+        FreeCAD.Console.PrintMessage(str(len(edges))+" edges to join\n")
         shapes = DraftGeomUtils.findWires(edges)
         for s in shapes:
             newob = addObject(s)
@@ -1140,9 +1176,11 @@ def processdxf(document,filename,getShapes=False):
     if circles: FreeCAD.Console.PrintMessage("drawing "+str(len(circles))+" circles...\n")
     for circle in circles:
         if dxfImportLayouts or (not rawValue(circle,67)):
-            shape = drawCircle(circle)
+            shape = drawCircle(circle,forceShape=batch)
             if shape:
-                if dxfCreateSketch:
+                if batch:
+                    addToBlock(shape,circle.layer)
+                elif dxfCreateSketch:
                     if dxfMakeBlocks or dxfJoin:
                         if sketch:
                             shape = Draft.makeSketch(shape,autoconstraints=True,addTo=sketch)
@@ -1151,8 +1189,6 @@ def processdxf(document,filename,getShapes=False):
                             sketch = shape
                     else:
                         shape = Draft.makeSketch(shape,autoconstraints=True)
-                elif dxfMakeBlocks:
-                    addToBlock(shape,circle.layer)
                 elif getShapes:
                     if isinstance(shape,Part.Shape):
                         shapes.append(shape)
@@ -1171,7 +1207,7 @@ def processdxf(document,filename,getShapes=False):
         if dxfImportLayouts or (not rawValue(solid,67)):
             shape = drawSolid(solid)
             if shape:
-                if dxfMakeBlocks:
+                if batch:
                     addToBlock(shape,lay)
                 elif getShapes:
                     if isinstance(shape,Part.Shape):
@@ -1189,9 +1225,9 @@ def processdxf(document,filename,getShapes=False):
     for spline in splines:
         lay = rawValue(spline,8)
         if dxfImportLayouts or (not rawValue(spline,67)):
-            shape = drawSpline(spline)
+            shape = drawSpline(spline,forceShape=batch)
             if shape:
-                if dxfMakeBlocks:
+                if batch:
                     addToBlock(shape,lay)
                 elif getShapes:
                     if isinstance(shape,Part.Shape):
@@ -1209,9 +1245,9 @@ def processdxf(document,filename,getShapes=False):
     for ellipse in ellipses:
         lay = rawValue(ellipse,8)
         if dxfImportLayouts or (not rawValue(ellipse,67)):
-            shape = drawEllipse(ellipse)
+            shape = drawEllipse(ellipse,forceShape=batch)
             if shape:
-                if dxfMakeBlocks:
+                if batch:
                     addToBlock(shape,lay)
                 elif getShapes:
                     if isinstance(shape,Part.Shape):
@@ -1247,6 +1283,8 @@ def processdxf(document,filename,getShapes=False):
                     shapes.append(shape)
                 else:
                     shapes.append(shape.Shape)
+            elif batch:
+                addToBlock(shape,face3d.layer)
             else:
                 newob = addObject(shape,"Face",face3d.layer)
                 if gui: formatObject(newob,face3d)
@@ -1411,12 +1449,10 @@ def processdxf(document,filename,getShapes=False):
         inserts = newinserts
     if inserts:
         FreeCAD.Console.PrintMessage("drawing "+str(len(inserts))+" blocks...\n")
-        blockrefs = drawing.blocks.data
-        for ref in blockrefs:
-            if dxfCreateDraft or dxfCreateSketch:
+        # clones need an object for each block, plain shapes are drawn on first use
+        if (dxfCreateDraft or dxfCreateSketch) and not(dxfMakeBlocks):
+            for ref in drawing.blocks.data:
                 drawBlock(ref,createObject=True)
-            else:
-                drawBlock(ref,createObject=False)
         num = 0
         for insert in inserts:
             if (dxfCreateDraft or dxfCreateSketch) and not(dxfMakeBlocks):
@@ -1436,9 +1472,10 @@ def processdxf(document,filename,getShapes=False):
     if dxfMakeBlocks:
         print("creating layerblocks...")
         for k,l in layerBlocks.items():
-            shape = drawLayerBlock(l)
-            if shape:
-                newob = addObject(shape,k)
+            for newob in drawLayerBlock(l,k):
+                locateLayer(k).addObject(newob)
+                if gui:
+                    formatLayerObject(newob,k)
     del layerBlocks
 
     # hide block objects, if any
@@ -1458,6 +1495,7 @@ def processdxf(document,filename,getShapes=False):
         print("dxf: ",len(badobjects)," objects were not imported")
     del doc
     del blockshapes
+    del blockdefs
 
 def warn(dxfobject,num=None):
     "outputs a warning if a dxf object couldn't be imported"
@@ -1772,18 +1810,27 @@ def export(objectslist,filename,nospline=False,lwPoly=False):
             exportPage(exportList[0],filename)
 
         else:
-            # other cases, treat edges
+            # other cases, treat edges. The entities of each object are written
+            # to a temporary file right away, only the blocks are kept in the
+            # drawing until the file is assembled by saveStreamed()
+            import tempfile
             dxf = dxfLibrary.Drawing()
+            entities = tempfile.TemporaryFile()
+            p = FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Draft")
+            dxfMesh = p.GetBool("dxfmesh")
+            dxfProject = gui and p.GetBool("dxfproject")
+            if dxfProject:
+                direction = FreeCADGui.ActiveDocument.ActiveView.\
+                        getViewDirection().multiply(-1)
+            FreeCAD.Console.PrintMessage("exporting "+str(len(exportList))+" objects...\n")
             for ob in exportList:
-                print("processing "+str(ob.Name))
+                ents = []
                 if ob.isDerivedFrom("Part::Feature"):
-                    if FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Draft").GetBool("dxfmesh"):
+                    if dxfMesh:
                         sh = None
                         if not ob.Shape.isNull():
-                            writeMesh(ob,dxf)
-                    elif gui and FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Draft").GetBool("dxfproject"):
-                        direction = FreeCADGui.ActiveDocument.ActiveView.\
-                                getViewDirection().multiply(-1)
+                            writeMesh(ob,ents)
+                    elif dxfProject:
                         sh = projectShape(ob.Shape,direction)
                     else:
                         if ob.Shape.Volume > 0:
@@ -1796,19 +1843,19 @@ def export(objectslist,filename,nospline=False,lwPoly=False):
                                 if (len(sh.Wires) == 1):
                                     # only one wire in this compound, no lone edge -> polyline
                                     if (len(sh.Wires[0].Edges) == len(sh.Edges)):
-                                        writeShape(sh,ob,dxf,nospline,lwPoly)
+                                        writeShape(sh,ob,ents,nospline,lwPoly)
                                     else:
                                         # 1 wire + lone edges -> block
                                         block = getBlock(sh,ob,lwPoly)
                                         dxf.blocks.append(block)
-                                        dxf.append(dxfLibrary.Insert(name=ob.Name.upper()))
+                                        ents.append(dxfLibrary.Insert(name=ob.Name.upper()))
                                 else:
                                     # all other cases: block
                                     block = getBlock(sh,ob,lwPoly)
                                     dxf.blocks.append(block)
-                                    dxf.append(dxfLibrary.Insert(name=ob.Name.upper()))
+                                    ents.append(dxfLibrary.Insert(name=ob.Name.upper()))
                             else:
-                                writeShape(sh,ob,dxf,nospline,lwPoly)
+                                writeShape(sh,ob,ents,nospline,lwPoly)
 
                 elif Draft.getType(ob) == "Annotation":
                     # texts
@@ -1821,7 +1868,7 @@ def export(objectslist,filename,nospline=False,lwPoly=False):
                                                          ob.Position.z))
                         if gui: height = float(ob.ViewObject.FontSize)
                         else: height = 1
-                        dxf.append(dxfLibrary.Text(text,point,height=height,
+                        ents.append(dxfLibrary.Text(text,point,height=height,
                                                    color=getACI(ob,text=True),
                                                    style='STANDARD',
                                                    layer=getGroup(ob)))
@@ -1835,14 +1882,38 @@ def export(objectslist,filename,nospline=False,lwPoly=False):
                         pbase = DraftVecUtils.tup(ob.End)
                     else:
                         pbase = DraftVecUtils.tup(ob.End.add(proj.negative()))
-                    dxf.append(dxfLibrary.Dimension(pbase,p1,p2,color=getACI(ob),
+                    ents.append(dxfLibrary.Dimension(pbase,p1,p2,color=getACI(ob),
                                                     layer=getGroup(ob)))
 
-            dxf.saveas(filename)
+                for e in ents:
+                    entities.write(str(e))
+            saveStreamed(dxf,entities,filename)
+            entities.close()
         FreeCAD.Console.PrintMessage("successfully exported "+filename+"\r\n")
     else:
         errorDXFLib(gui)
 
+def saveStreamed(dxf,entities,filename):
+    """writes the header, tables and blocks of the drawing to the file, then
+    the entities already written to the entities file"""
+    import shutil
+    text = str(dxf) # the drawing has no entities itself
+    m = re.search(r"SECTION\s*\n\s*2\s*\nENTITIES\s*\n",text)
+    if m:
+        head = text[:m.end()]
+        tail = text[m.end():]
+    else:
+        # no (empty) entities section written, add one before the end of file
+        m = re.search(r"\s*0\s*\nEOF\s*$",text)
+        head = text[:m.start()]+"\n0\nSECTION\n2\nENTITIES\n"
+        tail = "0\nENDSEC\n0\nEOF\n"
+    f = pythonopen(filename,"w")
+    f.write(head)
+    entities.seek(0)
+    shutil.copyfileobj(entities,f)
+    f.write(tail)
+    f.close()
+
 def exportPage(page,filename):
     "special export for pages"
     template = os.path.splitext(page.Template)[0]+".dxf"
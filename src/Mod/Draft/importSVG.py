@@ -387,9 +387,16 @@ class svgHandler(xml.sax.ContentHandler):
                 params = FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Draft")
                 self.style = params.GetInt("svgstyle")
                 self.disableUnitScaling = params.GetBool("svgDisableUnitScaling",False)
+                self.joinGroups = params.GetBool("svgJoinGroups",False)
                 self.count = 0
                 self.transform = None
                 self.grouptransform = []
+                # product of the group transforms, for each group level (None: identity)
+                self.groupmatrix = [None]
+                # (name, {style: shapes}) of each open group, if joinGroups
+                self.groupshapes = []
+                # transform attribute -> matrix
+                self.matrices = {}
                 self.lastdim = None
                 self.viewbox = None
                 self.symbols = {}
@@ -411,13 +418,33 @@ class svgHandler(xml.sax.ContentHandler):
                         b = float(((c>>8)&0xFF)/255)
                 self.col = (r,g,b,0.0)
 
-        def format(self,obj):
-                "applies styles to passed object"
+        def format(self,obj,style=None):
+                "applies styles (the current ones or the given (color,width,fill)) to passed object"
                 if self.style and gui:
+                        if style:
+                                color,width,fill = style
+                        else:
+                                color,width,fill = self.color,self.width,self.fill
                         v = obj.ViewObject
-                        if self.color: v.LineColor = self.color
-                        if self.width: v.LineWidth = self.width
-                        if self.fill: v.ShapeColor = self.fill
+                        if color: v.LineColor = color
+                        if width: v.LineWidth = width
+                        if fill: v.ShapeColor = fill
+
+        def addShape(self,sh,name):
+                "adds an object with the given shape, or keeps the shape for the compound of its group"
+                if self.joinGroups and self.groupshapes and not self.currentsymbol:
+                        shapes = self.groupshapes[-1][1]
+                        style = (self.color,self.width,self.fill)
+                        if style in shapes:
+                                shapes[style].append(sh)
+                        else:
+                                shapes[style] = [sh]
+                        return
+                obj = self.doc.addObject("Part::Feature",name)
+                obj.Shape = sh
+                self.format(obj)
+                if self.currentsymbol:
+                        self.symbols[self.currentsymbol].append(obj)
         
         def startElement(self, name, attrs):
 
@@ -425,8 +452,6 @@ class svgHandler(xml.sax.ContentHandler):
 
                 self.count += 1
 
-                FreeCAD.Console.PrintMessage('processing element %d: %s\n'%(self.count,name))
-                FreeCAD.Console.PrintMessage('existing group transform: %s\n'%(str(self.grouptransform)))
                 
                 data = {}
                 for (keyword,content) in list(attrs.items()):
@@ -512,14 +537,28 @@ class svgHandler(xml.sax.ContentHandler):
                         if data['stroke-width'] != 'none':
                                 self.width = getsize(data['stroke-width'],'css')
                 if 'transform' in data:
-                        m = self.getMatrix(attrs.getValue('transform'))
+                        tr = attrs.getValue('transform')
+                        if not tr in self.matrices:
+                                self.matrices[tr] = self.getMatrix(tr)
+                        m = self.matrices[tr]
                         if name == "g":
                                 self.grouptransform.append(m)
                         else:
                                 self.transform = m
                 else:
                         if name == "g":
-                                self.grouptransform.append(FreeCAD.Matrix())
+                                self.grouptransform.append(None)
+
+                if name == "g" or name == "svg":
+                        m = self.grouptransform[-1]
+                        if m is None:
+                                m = self.groupmatrix[-1]
+                        elif self.groupmatrix[-1] is not None:
+                                m = self.groupmatrix[-1].multiply(m)
+                        self.groupmatrix.append(m)
+                        if self.joinGroups:
+                                groupname = attrs.get('inkscape:label') or attrs.get('id') or name
+                                self.groupshapes.append((groupname,{}))
 
                 if (self.style == 1):
                         self.color = self.col
@@ -528,12 +567,10 @@ class svgHandler(xml.sax.ContentHandler):
                 pathname = None
                 if 'id' in data:
                         pathname = data['id'][0]
-                        FreeCAD.Console.PrintMessage('name: %s\n'%pathname)
                         
                 # processing paths
                         
                 if name == "path":
-                        FreeCAD.Console.PrintMessage('data: %s\n'%str(data))
                         
                         if not pathname: pathname = 'Path'
 
@@ -572,11 +609,7 @@ class svgHandler(xml.sax.ContentHandler):
                                                 if self.fill and sh.isClosed():
                                                     sh = Part.Face(sh)
                                                 sh = self.applyTrans(sh)
-                                                obj = self.doc.addObject("Part::Feature",pathname)
-                                                obj.Shape = sh
-                                                self.format(obj)
-                                                if self.currentsymbol:
-                                                    self.symbols[self.currentsymbol].append(obj)
+                                                self.addShape(sh,pathname)
                                                 path = []
                                                 #if firstvec:
                                                 #        lastvec = firstvec #Move relative to last move command not last draw command
@@ -585,7 +618,6 @@ class svgHandler(xml.sax.ContentHandler):
                                         else:
                                                 lastvec = Vector(x,-y,0)
                                         firstvec = lastvec
-                                        FreeCAD.Console.PrintMessage('move %s\n'%str(lastvec))
                                         lastpole = None
                                 if (d == "L" or d == "l") or \
                                         ((d == 'm' or d == 'M') and pointlist) :
@@ -596,7 +628,6 @@ class svgHandler(xml.sax.ContentHandler):
                                                         currentvec = Vector(x,-y,0)
                                                 if not DraftVecUtils.equals(lastvec,currentvec):
                                                         seg = Part.Line(lastvec,currentvec).toShape()
-                                                        FreeCAD.Console.PrintMessage("line %s %s\n" %(lastvec,currentvec))
                                                         lastvec = currentvec
                                                         path.append(seg)
                                                 lastpole = None
@@ -782,27 +813,19 @@ class svgHandler(xml.sax.ContentHandler):
                                                 sh=makewire(path,donttry=False)
                                                 if self.fill: sh = Part.Face(sh)
                                                 sh = self.applyTrans(sh)
-                                                obj = self.doc.addObject("Part::Feature",pathname)
-                                                obj.Shape = sh
-                                                self.format(obj)
+                                                self.addShape(sh,pathname)
                                                 path = []
                                                 if firstvec:
                                                         lastvec = firstvec #Move relative to recent draw command
                                                 point = []
                                                 command = None
-                                                if self.currentsymbol:
-                                                    self.symbols[self.currentsymbol].append(obj)
                         if path:
                                 sh=makewire(path,checkclosed=False)
                                 #sh = Part.Wire(path)
                                 if self.fill and sh.isClosed():
                                     sh = Part.Face(sh)
                                 sh = self.applyTrans(sh)
-                                obj = self.doc.addObject("Part::Feature",pathname)
-                                obj.Shape = sh
-                                self.format(obj)
-                                if self.currentsymbol:
-                                    self.symbols[self.currentsymbol].append(obj)
+                                self.addShape(sh,pathname)
 
 
                 # processing rects
@@ -877,11 +900,7 @@ class svgHandler(xml.sax.ContentHandler):
                         sh = Part.Wire(edges)
                         if self.fill: sh = Part.Face(sh)
                         sh = self.applyTrans(sh)
-                        obj = self.doc.addObject("Part::Feature",pathname)
-                        obj.Shape = sh
-                        self.format(obj)
-                        if self.currentsymbol:
-                            self.symbols[self.currentsymbol].append(obj)
+                        self.addShape(sh,pathname)
                         
                 # processing lines
 
@@ -891,11 +910,7 @@ class svgHandler(xml.sax.ContentHandler):
                         p2 = Vector(data['x2'],-data['y2'],0)
                         sh = Part.Line(p1,p2).toShape()
                         sh = self.applyTrans(sh)
-                        obj = self.doc.addObject("Part::Feature",pathname)
-                        obj.Shape = sh
-                        self.format(obj)
-                        if self.currentsymbol:
-                            self.symbols[self.currentsymbol].append(obj)
+                        self.addShape(sh,pathname)
 
                 # processing polylines and polygons
 
@@ -904,7 +919,6 @@ class svgHandler(xml.sax.ContentHandler):
                         but there would be more difficlult to search for duplicate points beforehand.'''
                         if not pathname: pathname = 'Polyline'
                         points=[float(d) for d in data['points']]
-                        FreeCAD.Console.PrintMessage('points %s\n'%str(points))
                         lenpoints=len(points)
                         if lenpoints>=4 and lenpoints % 2 == 0:
                                 lastvec = Vector(points[0],-points[1],0)
@@ -923,10 +937,7 @@ class svgHandler(xml.sax.ContentHandler):
                                         if self.fill and sh.isClosed():
                                             sh = Part.Face(sh)
                                         sh = self.applyTrans(sh)
-                                        obj = self.doc.addObject("Part::Feature",pathname)
-                                        obj.Shape = sh
-                                        if self.currentsymbol:
-                                            self.symbols[self.currentsymbol].append(obj)
+                                        self.addShape(sh,pathname)
 
                 # processing ellipses
 
@@ -950,11 +961,7 @@ class svgHandler(xml.sax.ContentHandler):
                                 sh = Part.Wire([sh])
                                 sh = Part.Face(sh)
                         sh = self.applyTrans(sh)
-                        obj = self.doc.addObject("Part::Feature",pathname)
-                        obj.Shape = sh
-                        self.format(obj)
-                        if self.currentsymbol:
-                            self.symbols[self.currentsymbol].append(obj)
+                        self.addShape(sh,pathname)
 
 
                 # processing circles
@@ -969,17 +976,12 @@ class svgHandler(xml.sax.ContentHandler):
                                 sh = Part.Face(sh)
                         sh.translate(c)
                         sh = self.applyTrans(sh)
-                        obj = self.doc.addObject("Part::Feature",pathname)
-                        obj.Shape = sh
-                        self.format(obj)
-                        if self.currentsymbol:
-                            self.symbols[self.currentsymbol].append(obj)
+                        self.addShape(sh,pathname)
 
                 # processing texts
 
                 if name in ["text","tspan"]:
                         if not("freecad:skip" in data):
-                                FreeCAD.Console.PrintMessage("processing a text\n")
                                 if 'x' in data:
                                         self.x = data['x']
                                 else:
@@ -1023,11 +1025,9 @@ class svgHandler(xml.sax.ContentHandler):
                         else:
                             FreeCAD.Console.PrintMessage("no symbol data\n")
 
-                FreeCAD.Console.PrintMessage("done processing element %d\n"%self.count)
                 
         def characters(self,content):
                 if self.text:
-                        FreeCAD.Console.PrintMessage("reading characters %s\n" % content)
                         obj=self.doc.addObject("App::Annotation",'Text')
                         obj.LabelText = content.encode('latin1')
                         if self.currentsymbol:
@@ -1036,9 +1036,8 @@ class svgHandler(xml.sax.ContentHandler):
                         if self.transform:
                                 vec = self.translateVec(vec,self.transform)
                                 #print "own transform: ",self.transform, vec
-                        for transform in self.grouptransform[::-1]:
-                                #vec = self.translateVec(vec,transform)
-                                vec = transform.multiply(vec)
+                        if self.groupmatrix[-1] is not None:
+                                vec = self.groupmatrix[-1].multiply(vec)
                         #print "applying vector: ",vec
                         obj.Position = vec
                         if gui:
@@ -1051,8 +1050,14 @@ class svgHandler(xml.sax.ContentHandler):
                 self.transform = None
                 self.text = None
             if name == "g" or name == "svg":
-                FreeCAD.Console.PrintMessage("closing group\n")
                 self.grouptransform.pop()
+                self.groupmatrix.pop()
+                if self.joinGroups:
+                    groupname,shapes = self.groupshapes.pop()
+                    for style,l in shapes.items():
+                        obj = self.doc.addObject("Part::Feature",groupname)
+                        obj.Shape = Part.makeCompound(l)
+                        self.format(obj,style)
             if name == "symbol":
                 if self.doc.getObject("svgsymbols"):
                     group = self.doc.getObject("svgsymbols")
@@ -1065,27 +1070,27 @@ class svgHandler(xml.sax.ContentHandler):
 
         def applyTrans(self,sh):
                 if isinstance(sh,Part.Shape):
+                        # the object transform and the (cached) transform of
+                        # all groups, applied at once
+                        m = self.groupmatrix[-1]
                         if self.transform:
-                                FreeCAD.Console.PrintMessage("applying object transform: %s\n" % self.transform)
-                                #sh = transformCopyShape(sh,self.transform)
+                                if m is not None:
+                                        m = m.multiply(self.transform)
+                                else:
+                                        m = self.transform
+                        if m is not None:
+                                #sh = transformCopyShape(sh,m)
                                 # see issue #2062
-                                sh = sh.transformGeometry(self.transform)
-                        for transform in self.grouptransform[::-1]:
-                                FreeCAD.Console.PrintMessage("applying group transform: %s\n" % transform)
-                                #sh = transformCopyShape(sh,transform)
-                                # see issue 2062
-                                sh = sh.transformGeometry(transform)
+                                sh = sh.transformGeometry(m)
                         return sh
                 elif Draft.getType(sh) == "Dimension":
                         pts = []
                         for p in [sh.Start,sh.End,sh.Dimline]:
                                 cp = Vector(p)
                                 if self.transform:
-                                        FreeCAD.Console.PrintMessage("applying object transform: %s\n" % self.transform)
                                         cp = self.transform.multiply(cp)
-                                for transform in self.grouptransform[::-1]:
-                                        FreeCAD.Console.PrintMessage("applying group transform: %s\n" % transform)
-                                        cp = transform.multiply(cp)
+                                if self.groupmatrix[-1] is not None:
+                                        cp = self.groupmatrix[-1].multiply(cp)
                                 pts.append(cp)
                         sh.Start = pts[0]
                         sh.End = pts[1]
@@ -1160,17 +1165,15 @@ def getContents(filename,tag,stringmode=False):
                 f = pythonopen(filename)
                 contents = f.read()
                 f.close()
-        contents = contents.replace('\n','_linebreak')
         searchpat = '<'+tag+'.*?</'+tag+'>'
-        tags = re.findall(searchpat,contents)
+        tags = re.findall(searchpat,contents,re.DOTALL)
         for t in tags:
                 tagid = re.findall('id="(.*?)"',t)
                 if tagid:
                         tagid = tagid[0]
                 else:
                         tagid = 'none'
-                res = t.replace('_linebreak','\n')
-                result[tagid] = res
+                result[tagid] = t
         return result
 
 def open(filename):
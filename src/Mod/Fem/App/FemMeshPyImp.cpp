@@ -445,6 +445,134 @@ PyObject* FemMeshPy::addVolume(PyObject *args)
 
 }
 
+namespace {
+// reads a flat sequence of numbers in one go, returns false with a Python exception set on failure
+bool getDoubles(PyObject* obj, std::vector<double>& values)
+{
+    PyObject* seq = PySequence_Fast(obj, "sequence of floats expected");
+    if (!seq)
+        return false;
+    Py_ssize_t size = PySequence_Fast_GET_SIZE(seq);
+    PyObject** items = PySequence_Fast_ITEMS(seq);
+    values.resize(size);
+    for (Py_ssize_t i=0; i<size; ++i)
+        values[i] = PyFloat_AsDouble(items[i]);
+    Py_DECREF(seq);
+    return !PyErr_Occurred();
+}
+
+bool getInts(PyObject* obj, std::vector<int>& values)
+{
+    PyObject* seq = PySequence_Fast(obj, "sequence of ints expected");
+    if (!seq)
+        return false;
+    Py_ssize_t size = PySequence_Fast_GET_SIZE(seq);
+    PyObject** items = PySequence_Fast_ITEMS(seq);
+    values.resize(size);
+    for (Py_ssize_t i=0; i<size; ++i)
+        values[i] = (int)PyInt_AsLong(items[i]);
+    Py_DECREF(seq);
+    return !PyErr_Occurred();
+}
+
+SMDS_MeshVolume* addVolumeByNodes(SMESHDS_Mesh* meshDS, const std::vector<const SMDS_MeshNode*>& n, int id)
+{
+    switch (n.size()) {
+        case 4:
+            if (id < 0)
+                return meshDS->AddVolume(n[0],n[1],n[2],n[3]);
+            return meshDS->AddVolumeWithID(n[0],n[1],n[2],n[3],id);
+        case 8:
+            if (id < 0)
+                return meshDS->AddVolume(n[0],n[1],n[2],n[3],n[4],n[5],n[6],n[7]);
+            return meshDS->AddVolumeWithID(n[0],n[1],n[2],n[3],n[4],n[5],n[6],n[7],id);
+        case 10:
+            if (id < 0)
+                return meshDS->AddVolume(n[0],n[1],n[2],n[3],n[4],n[5],n[6],n[7],n[8],n[9]);
+            return meshDS->AddVolumeWithID(n[0],n[1],n[2],n[3],n[4],n[5],n[6],n[7],n[8],n[9],id);
+        default:
+            throw std::runtime_error("Unknown node count, [4|8|10] are allowed");
+    }
+}
+}
+
+PyObject* FemMeshPy::addNodes(PyObject *args)
+{
+    PyObject *coords;
+    PyObject *ids=0;
+    if (!PyArg_ParseTuple(args, "O|O", &coords, &ids))
+        return 0;
+
+    std::vector<double> xyz;
+    std::vector<int> nodeIds;
+    if (!getDoubles(coords, xyz))
+        return 0;
+    if (ids && !getInts(ids, nodeIds))
+        return 0;
+    if (xyz.size() % 3 != 0 || (ids && nodeIds.size() * 3 != xyz.size())) {
+        PyErr_SetString(PyExc_ValueError, "addNodes() expects three coordinates per node and one id per node");
+        return 0;
+    }
+
+    try {
+        SMESHDS_Mesh* meshDS = getFemMeshPtr()->getSMesh()->GetMeshDS();
+        for (std::size_t i=0; i<xyz.size()/3; ++i) {
+            SMDS_MeshNode* node;
+            if (ids)
+                node = meshDS->AddNodeWithID(xyz[3*i],xyz[3*i+1],xyz[3*i+2],nodeIds[i]);
+            else
+                node = meshDS->AddNode(xyz[3*i],xyz[3*i+1],xyz[3*i+2]);
+            if (!node)
+                throw std::runtime_error("Failed to add node");
+        }
+    }
+    catch (const std::exception& e) {
+        PyErr_SetString(Base::BaseExceptionFreeCADError, e.what());
+        return 0;
+    }
+    Py_Return;
+}
+
+PyObject* FemMeshPy::addVolumes(PyObject *args)
+{
+    PyObject *nodes;
+    int count;
+    PyObject *ids=0;
+    if (!PyArg_ParseTuple(args, "Oi|O", &nodes, &count, &ids))
+        return 0;
+
+    std::vector<int> nodeIds;
+    std::vector<int> volumeIds;
+    if (!getInts(nodes, nodeIds))
+        return 0;
+    if (ids && !getInts(ids, volumeIds))
+        return 0;
+    if (count <= 0 || nodeIds.size() % count != 0 ||
+        (ids && volumeIds.size() * count != nodeIds.size())) {
+        PyErr_SetString(PyExc_ValueError, "addVolumes() expects nodesPerVolume node indices and one id per volume");
+        return 0;
+    }
+
+    try {
+        SMESHDS_Mesh* meshDS = getFemMeshPtr()->getSMesh()->GetMeshDS();
+        std::vector<const SMDS_MeshNode*> volumeNodes(count);
+        for (std::size_t i=0; i<nodeIds.size()/count; ++i) {
+            for (int j=0; j<count; ++j) {
+                volumeNodes[j] = meshDS->FindNode(nodeIds[i*count+j]);
+                if (!volumeNodes[j])
+                    throw std::runtime_error("Failed to get node of the given indices");
+            }
+            if (!addVolumeByNodes(meshDS, volumeNodes, ids ? volumeIds[i] : -1))
+                throw std::runtime_error("Failed to add volume");
+        }
+    }
+    catch (const std::exception& e) {
+        PyErr_SetString(Base::BaseExceptionFreeCADError, e.what());
+        return 0;
+    }
+    Py_Return;
+}
+
 PyObject* FemMeshPy::copy(PyObject *args)
 {
     if (!PyArg_ParseTuple(args, ""))
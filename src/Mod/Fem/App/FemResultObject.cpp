@@ -42,6 +42,9 @@ FemResultObject::FemResultObject()
     ADD_PROPERTY_TYPE(DisplacementVectors,(), "Fem",Prop_None,"List of displacement vectors");
     ADD_PROPERTY_TYPE(DisplacementLengths,(0), "Fem",Prop_None,"List of displacement lengths");
     ADD_PROPERTY_TYPE(StressValues,(0), "Fem",Prop_None,"List of Von Misses strass values");
+    ADD_PROPERTY_TYPE(PrincipalMax,(0), "Fem",Prop_None,"List of maximum principal stress values");
+    ADD_PROPERTY_TYPE(PrincipalMed,(0), "Fem",Prop_None,"List of medium principal stress values");
+    ADD_PROPERTY_TYPE(PrincipalMin,(0), "Fem",Prop_None,"List of minimum principal stress values");
     ADD_PROPERTY_TYPE(Mesh,(0), "General",Prop_None,"Link to the corrresponding mesh");
 }
 
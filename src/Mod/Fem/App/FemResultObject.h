@@ -53,6 +53,10 @@ public:
     App::PropertyFloatList DisplacementLengths;
     /// Von Mises Stress values of analysis
     App::PropertyFloatList StressValues;
+    /// Principal stresses of analysis, largest to smallest
+    App::PropertyFloatList PrincipalMax;
+    App::PropertyFloatList PrincipalMed;
+    App::PropertyFloatList PrincipalMin;
 
     /// returns the type name of the ViewProvider
     virtual const char* getViewProviderName(void) const {
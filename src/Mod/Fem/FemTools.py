@@ -231,16 +231,46 @@ class FemTools(QtCore.QRunnable, QtCore.QObject):
 
     ## returns minimum, average and maximum value for provided result type
     #  @param self The python object self
-    #  @result_type Type of FEM result, allowed U1, U2, U3, Uabs, Sabs and None
-    def get_stats(self, result_type):
+    #  @result_type Type of FEM result, allowed U1, U2, U3, Uabs, Sabs, P1, P2, P3 and None
+    #  @node_set optional FemSetNodesObject or list of node ids the statistics are restricted to
+    def get_stats(self, result_type, node_set=None):
         stats = (0.0, 0.0, 0.0)
         for m in self.analysis.Member:
             if m.isDerivedFrom("Fem::FemResultObject"):
+                if node_set is not None:
+                    stats = self.get_node_set_stats(m, result_type, node_set)
+                    continue
                 match = {"U1": (m.Stats[0], m.Stats[1], m.Stats[2]),
                          "U2": (m.Stats[3], m.Stats[4], m.Stats[5]),
                          "U3": (m.Stats[6], m.Stats[7], m.Stats[8]),
                          "Uabs": (m.Stats[9], m.Stats[10], m.Stats[11]),
                          "Sabs": (m.Stats[12], m.Stats[13], m.Stats[14]),
                          "None": (0.0, 0.0, 0.0)}
+                if len(m.Stats) >= 24:
+                    match["P1"] = (m.Stats[15], m.Stats[16], m.Stats[17])
+                    match["P2"] = (m.Stats[18], m.Stats[19], m.Stats[20])
+                    match["P3"] = (m.Stats[21], m.Stats[22], m.Stats[23])
                 stats = match[result_type]
         return stats
+
+    ## returns minimum, average and maximum value of a result type for the nodes of a node set
+    #  @param self The python object self
+    #  @result_object FemResultObject the values are taken from
+    #  @result_type Type of FEM result, see get_stats
+    #  @node_set FemSetNodesObject or list of node ids
+    def get_node_set_stats(self, result_object, result_type, node_set):
+        import ccxFrdReader
+        if hasattr(node_set, "Nodes"):
+            node_set = node_set.Nodes
+        if result_type in ("U1", "U2", "U3"):
+            values = [v[int(result_type[1]) - 1] for v in result_object.DisplacementVectors]
+        else:
+            match = {"Uabs": "DisplacementLengths",
+                     "Sabs": "StressValues",
+                     "P1": "PrincipalMax",
+                     "P2": "PrincipalMed",
+                     "P3": "PrincipalMin"}
+            values = getattr(result_object, match[result_type]) if result_type in match else []
+        if not values:
+            return (0.0, 0.0, 0.0)
+        return tuple(ccxFrdReader.calculate_stats(values, result_object.ElementNumbers, node_set))
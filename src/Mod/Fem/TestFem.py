@@ -28,6 +28,8 @@ import Fem
 import FemTools
 import FreeCAD
 import MechanicalAnalysis
+import ccxFrdReader
+import ccxJobRunner
 import csv
 import tempfile
 import unittest
@@ -37,6 +39,7 @@ working_dir = tempfile.gettempdir() + '/FEM/'
 standard_inp_file = FreeCAD.getHomePath() + 'Mod/Fem/inp_standard.inp'
 mesh_points_file = FreeCAD.getHomePath() + 'Mod/Fem/mesh_points.csv'
 mesh_volumes_file = FreeCAD.getHomePath() + 'Mod/Fem/mesh_volumes.csv'
+frd_result_file = FreeCAD.getHomePath() + 'Mod/Fem/tet10_result.frd'
 
 
 class FemTest(unittest.TestCase):
@@ -158,6 +161,60 @@ class FemTest(unittest.TestCase):
         ret = self.compare_inp_files(standard_inp_file, working_dir + "/" + mesh_name + '.inp')
         self.assertFalse(ret, "FemTools write_inp_file test failed.\n{}".format(ret))
 
+    def test_job_runner(self):
+        FreeCAD.Console.PrintMessage('\nChecking FEM job runner prerequisites...\n')
+        self.create_new_analysis()
+        runner = ccxJobRunner.ccx_runner(working_dir, jobs=2, threads=1, progress=lambda job, message: None)
+        job = runner.add(self.analysis)
+        self.assertEqual(runner.run(), [], "FemTest of job runner without mesh failed")
+        self.assertEqual(job.status, "failed", "FemTest of job runner status failed")
+        self.assertTrue(job.message, "FemTest of job runner message failed")
+
+    def test_bulk_mesh(self):
+        FreeCAD.Console.PrintMessage('\nChecking FEM mesh bulk insertion...\n')
+        self.create_new_mesh()
+        with open(mesh_points_file, 'r') as points_file:
+            points = [[float(x) for x in p] for p in csv.reader(points_file)]
+        with open(mesh_volumes_file, 'r') as volumes_file:
+            volumes = [[int(x) for x in v] for v in csv.reader(volumes_file)]
+        mesh = Fem.FemMesh()
+        mesh.addNodes([c for p in points for c in p[:3]], [int(p[3]) for p in points])
+        mesh.addVolumes([n for v in volumes for n in v], 10)
+        self.assertEqual(mesh.NodeCount, self.mesh.NodeCount, "FemTest of bulk node insertion failed")
+        self.assertEqual(mesh.VolumeCount, self.mesh.VolumeCount, "FemTest of bulk volume insertion failed")
+        self.assertEqual(mesh.Volume, self.mesh.Volume, "FemTest of bulk mesh volume failed")
+
+    def test_frd_reader(self):
+        FreeCAD.Console.PrintMessage('\nChecking FEM frd file read...\n')
+        m = ccxFrdReader.readResult(frd_result_file)
+        node_ids, node_coords = m['Nodes']
+        self.assertEqual(node_ids.tolist(), range(1, 12), "FemTest of frd node ids failed")
+        self.assertEqual(node_coords[10].tolist(), [-1.0, -2.0, 0.0], "FemTest of frd node coordinates failed")
+        elem_ids, elem_nodes = m['Tet10Elem']
+        self.assertEqual(elem_ids.tolist(), [1], "FemTest of frd element ids failed")
+        self.assertEqual(elem_nodes[0].tolist(), [2, 1, 3, 4, 5, 7, 6, 9, 8, 10], "FemTest of frd Tet10 node order failed")
+        disp_ids, disp_values = m['Displacement']
+        self.assertEqual(disp_values.tolist(), [[0.002, -0.004, 0.0]] * 2, "FemTest of frd displacements failed")
+        stress_ids, stress_values = m['Stress']
+        self.assertEqual(stress_values.shape, (2, 6), "FemTest of frd stress values failed")
+
+        FreeCAD.Console.PrintMessage('\nChecking FEM frd file index...\n')
+        frd = ccxFrdReader.frd_reader(frd_result_file)
+        self.assertEqual(frd.steps(), [1, 2], "FemTest of frd steps failed")
+        self.assertEqual(frd.result_types(1), ['DISP', 'STRESS'], "FemTest of frd result types failed")
+        self.assertEqual(frd.element_types, {6: 1}, "FemTest of frd element types failed")
+        disp_ids, disp_values = frd.result('DISP', 1)
+        self.assertEqual(disp_values.tolist(), [[0.001, -0.002, 0.0]] * 2, "FemTest of frd step displacements failed")
+
+        FreeCAD.Console.PrintMessage('\nChecking FEM stress post-processing...\n')
+        stress_ids, stress_values = frd.result('STRESS', 1)
+        mstress = ccxFrdReader.calculate_von_mises(stress_values)
+        self.assertAlmostEqual(mstress[0], 11.2694276696, 6, "FemTest of von Mises stress failed")
+        principal = ccxFrdReader.calculate_principal_stress(stress_values)
+        self.assertAlmostEqual(principal[0][0], 10.0827625303, 6, "FemTest of principal stress failed")
+        self.assertAlmostEqual(principal[0][2], -2.0827625303, 6, "FemTest of principal stress failed")
+        self.assertEqual(ccxFrdReader.calculate_stats(stress_values[:, 0]), [10.0, 10.0, 10.0], "FemTest of result stats failed")
+
     def tearDown(self):
         FreeCAD.closeDocument("FemTest")
         pass
@@ -24,7 +24,7 @@
 
 import FreeCAD
 import os
-from math import pow, sqrt
+import numpy
 
 __title__ = "FreeCAD Calculix library"
 __author__ = "Juergen Riegel "
@@ -33,98 +33,235 @@ __url__ = "http://www.freecadweb.org"
 if open.__module__ == '__builtin__':
     pyopen = open  # because we'll redefine open below
 
+# FreeCAD node order of the CalculiX element types the FEM mesh can hold, by frd element type
+elem_node_order = {3: [1, 0, 2, 3],  # Tet4
+                   6: [1, 0, 2, 3, 4, 6, 5, 8, 7, 9]}  # Tet10
 
-displacement = []
 
+# parse fixed-width columns of many equally formatted records at once
+# fields is a list of (start, end) slices, the result an array with one row per record
+def _fixed_width(records, fields, dtype):
+    if not records:
+        return numpy.empty((0, len(fields)), dtype)
+    width = max(end for start, end in fields)
+    chars = numpy.array(records, dtype='S{}'.format(width)).view('S1').reshape(len(records), width)
+    columns = [numpy.ascontiguousarray(chars[:, start:end]).view('S{}'.format(end - start)).ravel().astype(dtype)
+               for start, end in fields]
+    return numpy.column_stack(columns)
 
-# read a calculix result file and extract the nodes, displacement vectores and stress values.
-def readResult(frd_input):
-    frd_file = pyopen(frd_input, "r")
-    nodes = {}
-    disp = {}
-    stress = {}
-    elements = {}
 
-    disp_found = False
-    nodes_found = False
-    stress_found = False
-    elements_found = False
-    elem = -1
-    elemType = 0
-
-    for line in frd_file:
-        #Check if we found nodes section
-        if line[4:6] == "2C":
-            nodes_found = True
-        #first lets extract the node and coordinate information from the results file
-        if nodes_found and (line[1:3] == "-1"):
-            elem = int(line[4:13])
-            nodes_x = float(line[13:25])
-            nodes_y = float(line[25:37])
-            nodes_z = float(line[37:49])
-            nodes[elem] = FreeCAD.Vector(nodes_x, nodes_y, nodes_z)
-        #Check if we found nodes section
-        if line[4:6] == "3C":
-            elements_found = True
-        #first lets extract element number
-        if elements_found and (line[1:3] == "-1"):
-            elem = int(line[4:13])
-            elemType = int(line[14:18])
-        #then the 10 id's for the Tet10 element
-        if elements_found and (line[1:3] == "-2") and elemType == 6:
-            node_id_2 = int(line[3:13])
-            node_id_1 = int(line[13:23])
-            node_id_3 = int(line[23:33])
-            node_id_4 = int(line[33:43])
-            node_id_5 = int(line[43:53])
-            node_id_7 = int(line[53:63])
-            node_id_6 = int(line[63:73])
-            node_id_9 = int(line[73:83])
-            node_id_8 = int(line[83:93])
-            node_id_10 = int(line[93:103])
-            elements[elem] = (node_id_1, node_id_2, node_id_3, node_id_4, node_id_5, node_id_6, node_id_7, node_id_8, node_id_9, node_id_10)
-        #Check if we found displacement section
-        if line[5:9] == "DISP":
-            disp_found = True
-        #we found a displacement line in the frd file
-        if disp_found and (line[1:3] == "-1"):
-            elem = int(line[4:13])
-            disp_x = float(line[13:25])
-            disp_y = float(line[25:37])
-            disp_z = float(line[37:49])
-            disp[elem] = FreeCAD.Vector(disp_x, disp_y, disp_z)
-            displacement.append((disp_x, disp_y, disp_z))
-        if line[5:11] == "STRESS":
-            stress_found = True
-        #we found a displacement line in the frd file
-        if stress_found and (line[1:3] == "-1"):
-            elem = int(line[4:13])
-            stress_1 = float(line[13:25])
-            stress_2 = float(line[25:37])
-            stress_3 = float(line[37:49])
-            stress_4 = float(line[49:61])
-            stress_5 = float(line[61:73])
-            stress_6 = float(line[73:85])
-            stress[elem] = (stress_1, stress_2, stress_3, stress_4, stress_5, stress_6)
-        #Check for the end of a section
+# collect the lines of the current block up to its end marker (-3)
+def _read_block(frd_file):
+    records = []
+    for line in iter(frd_file.readline, ''):
         if line[1:3] == "-3":
-            #the section with the displacements and the nodes ended
-            disp_found = False
-            nodes_found = False
-            stress_found = False
-            elements_found = False
+            break
+        records.append(line)
+    return records
+
+
+# node coordinates or nodal results: (node ids, values) for the -1 records of a block
+# results with more than six components continue on -2 records
+def _read_values(records, components):
+    if components > 6:
+        rows = []
+        for line in records:
+            if line[1:3] == "-1":
+                rows.append(line.rstrip('\r\n'))
+            elif line[1:3] == "-2" and rows:
+                rows[-1] += line[13:].rstrip('\r\n')
+        records = rows
+    else:
+        records = [line for line in records if line[1:3] == "-1"]
+    ids = _fixed_width(records, [(3, 13)], numpy.int64)[:, 0]
+    values = _fixed_width(records, [(13 + 12 * i, 25 + 12 * i) for i in range(components)], numpy.float64)
+    return ids, values
+
+
+# element definitions grouped by element type: {elemType: (element ids, connectivity)}
+# the connectivity is kept in the node order CalculiX writes it
+def _read_elements(records):
+    heads = []
+    nodes = []
+    for line in records:
+        if line[1:3] == "-1":
+            heads.append(line)
+            nodes.append([])
+        elif line[1:3] == "-2" and nodes:
+            nodes[-1].append(line[3:].rstrip('\r\n'))
+    head = _fixed_width(heads, [(3, 13), (13, 18)], numpy.int64)
+    elements = {}
+    for elem_type in numpy.unique(head[:, 1]).tolist():
+        selected = numpy.flatnonzero(head[:, 1] == elem_type)
+        rows = [''.join(nodes[i]) for i in selected]
+        count = len(rows[0]) // 10
+        connectivity = _fixed_width(rows, [(10 * i, 10 * i + 10) for i in range(count)], numpy.int64)
+        elements[elem_type] = (head[selected, 0], connectivity)
+    return elements
+
+
+class frd_reader(object):
+    """Index of the blocks of a CalculiX result file.
+
+    A single pass over the file records the byte offsets of the nodes and
+    elements blocks and of every result block, per step and result type.
+    The blocks themselves are only parsed when they are asked for, so one
+    step or one field can be loaded from an arbitrarily large file.
+    """
+
+    def __init__(self, frd_input):
+        self.file_name = frd_input
+        self.nodes_offset = None
+        self.elements_offset = None
+        # {elemType: number of elements}
+        self.element_types = {}
+        # [{'Step': int, 'Time': float, 'Type': 'DISP', 'Components': int, 'Offset': int}, ...]
+        self.results = []
+        self._nodes = None
+        self._elements = None
+        self.scan()
+
+    def scan(self):
+        frd_file = pyopen(self.file_name, "rb")
+        for line in iter(frd_file.readline, ''):
+            # nodes section, the header holds the number of nodes
+            if line[4:6] == "2C":
+                self.nodes_offset = frd_file.tell()
+                self._skip_records(frd_file, int(line[24:36]), 1)
+            # elements section, count the elements per type
+            elif line[4:6] == "3C":
+                self.elements_offset = frd_file.tell()
+                for record in iter(frd_file.readline, ''):
+                    if record[1:3] == "-1":
+                        elem_type = int(record[13:18])
+                        self.element_types[elem_type] = self.element_types.get(elem_type, 0) + 1
+                    elif record[1:3] == "-3":
+                        break
+            # result section: step header, -4 result type, -5 component definitions
+            elif line[2:6] == "100C":
+                entry = {'Step': int(line[58:63]), 'Time': float(line[12:24])}
+                number_of_nodes = int(line[24:36])
+                entry['Type'] = frd_file.readline()[5:13].strip()
+                components = 0
+                offset = frd_file.tell()
+                record = frd_file.readline()
+                while record[1:3] == "-5":
+                    # components flagged in column 33-38 are not stored, e.g. ALL of DISP
+                    if record[33:38].strip() != "1":
+                        components += 1
+                    offset = frd_file.tell()
+                    record = frd_file.readline()
+                entry['Components'] = components
+                entry['Offset'] = offset
+                self.results.append(entry)
+                frd_file.seek(offset)
+                self._skip_records(frd_file, number_of_nodes, 1 + (components - 1) // 6)
+        frd_file.close()
+
+    # move behind the -3 of a block, jumping over its records if they all have the same length
+    def _skip_records(self, frd_file, count, lines_per_record):
+        start = frd_file.tell()
+        if count > 0 and lines_per_record == 1:
+            frd_file.seek(start + count * len(frd_file.readline()))
+            if frd_file.readline()[1:3] == "-3":
+                return
+            frd_file.seek(start)
+        _read_block(frd_file)
+
+    def _read(self, offset, parse, *args):
+        frd_file = pyopen(self.file_name, "rb")
+        frd_file.seek(offset)
+        data = parse(_read_block(frd_file), *args)
+        frd_file.close()
+        return data
+
+    def steps(self):
+        return sorted(set(r['Step'] for r in self.results))
+
+    def result_types(self, step=None):
+        return sorted(set(r['Type'] for r in self.results if step is None or r['Step'] == step))
+
+    def nodes(self):
+        if self._nodes is None:
+            if self.nodes_offset is None:
+                self._nodes = (numpy.empty(0, numpy.int64), numpy.empty((0, 3)))
+            else:
+                self._nodes = self._read(self.nodes_offset, _read_values, 3)
+        return self._nodes
+
+    ## returns the elements of the given CalculiX element type, or a dict of all types
+    #  the connectivity of Tet4 and Tet10 elements is converted to the FreeCAD node order
+    def elements(self, elem_type=None):
+        if self._elements is None:
+            if self.elements_offset is None:
+                self._elements = {}
+            else:
+                self._elements = self._read(self.elements_offset, _read_elements)
+                for t, order in elem_node_order.items():
+                    if t in self._elements:
+                        ids, connectivity = self._elements[t]
+                        self._elements[t] = (ids, connectivity[:, order])
+        if elem_type is None:
+            return self._elements
+        return self._elements.get(elem_type, (numpy.empty(0, numpy.int64), numpy.empty((0, 0), numpy.int64)))
+
+    ## returns (node ids, values) of a result type, e.g. DISP or STRESS
+    #  without a step the last block of that type in the file is used
+    def result(self, result_type, step=None):
+        blocks = [r for r in self.results if r['Type'] == result_type and (step is None or r['Step'] == step)]
+        if not blocks:
+            return None
+        return self._read(blocks[-1]['Offset'], _read_values, blocks[-1]['Components'])
+
+
+# read a calculix result file and extract the nodes, displacement vectores and stress values.
+# every entry of the returned dict is a pair of numpy arrays: the ids and one row of values per id
+# Elements holds all element types CalculiX wrote, {elemType: (element ids, connectivity)}
+def readResult(frd_input, step=None):
+    frd = frd_reader(frd_input)
+    nodes = frd.nodes()
+    disp = frd.result('DISP', step)
+    if disp is None:
+        disp = (numpy.empty(0, numpy.int64), numpy.empty((0, 3)))
+    stress = frd.result('STRESS', step)
+    if stress is None:
+        stress = (numpy.empty(0, numpy.int64), numpy.empty((0, 6)))
+    FreeCAD.Console.PrintLog('Read CalculiX result: {} Nodes, {} Displacements and {} Stress values\n'.format(len(nodes[0]), len(disp[0]), len(stress[0])))
+
+    return {'Nodes': nodes, 'Elements': frd.elements(), 'Tet10Elem': frd.elements(6), 'Displacement': disp, 'Stress': stress}
+
+
+## returns the von Mises stress of every row of an (n, 6) array of stress tensors
+#  (s11, s22, s33, s12, s23, s31), see http://en.wikipedia.org/wiki/Von_Mises_yield_criterion
+def calculate_von_mises(stress):
+    s11, s22, s33, s12, s23, s31 = stress.T
+    return numpy.sqrt(0.5 * ((s11 - s22) ** 2 + (s22 - s33) ** 2 + (s33 - s11) ** 2 +
+                             6 * (s12 ** 2 + s23 ** 2 + s31 ** 2)))
+
+
+## returns the principal stresses of every row of an (n, 6) array of stress tensors
+#  as an (n, 3) array, largest first
+def calculate_principal_stress(stress):
+    tensors = stress[:, [0, 3, 5, 3, 1, 4, 5, 4, 2]].reshape(-1, 3, 3)
+    return numpy.linalg.eigvalsh(tensors)[:, ::-1]
 
-    frd_file.close()
-    FreeCAD.Console.PrintLog('Read CalculiX result: {} Nodes, {} Displacements and {} Stress values\n'.format(len(nodes), len(disp), len(stress)))
 
-    return {'Nodes': nodes, 'Tet10Elem': elements, 'Displacement': disp, 'Stress': stress}
+## returns [min, avg, max] for every column of values (or for a 1-dimensional array)
+#  subset restricts the statistics to the rows whose id is in subset, e.g. the nodes of a node set
+def calculate_stats(values, ids=None, subset=None):
+    values = numpy.asarray(values, numpy.float64)
+    if values.ndim == 1:
+        values = values[:, numpy.newaxis]
+    if subset is not None:
+        values = values[numpy.in1d(ids, list(subset))]
+    if len(values) == 0:
+        return [0.0, 0.0, 0.0] * values.shape[1]
+    stats = numpy.column_stack((values.min(axis=0), values.mean(axis=0), values.max(axis=0)))
+    return stats.ravel().tolist()
 
 
-def importFrd(filename, Analysis=None):
-    mstress = []
-    global displacement
-    displacement = []
-    m = readResult(filename)
+def importFrd(filename, Analysis=None, step=None):
+    m = readResult(filename, step)
     MeshObject = None
     if(len(m) > 0):
         import Fem
@@ -136,72 +273,47 @@ def importFrd(filename, Analysis=None):
             AnalysisObject = Analysis
         results = FreeCAD.ActiveDocument.addObject('Fem::FemResultObject', 'Results')
 
-        if ('Tet10Elem' in m) and ('Nodes' in m) and (not Analysis):
+        if ('Elements' in m) and ('Nodes' in m) and (not Analysis):
             mesh = Fem.FemMesh()
-            nds = m['Nodes']
-            for i in nds:
-                n = nds[i]
-                mesh.addNode(n[0], n[1], n[2], i)
-            elms = m['Tet10Elem']
-            for i in elms:
-                e = elms[i]
-                mesh.addVolume([e[0], e[1], e[2], e[3], e[4], e[5], e[6], e[7], e[8], e[9]], i)
-            if len(nds) > 0:
+            node_ids, node_coords = m['Nodes']
+            mesh.addNodes(node_coords.ravel().tolist(), node_ids.tolist())
+            for elem_type, (elem_ids, elem_nodes) in m['Elements'].items():
+                if elem_type in elem_node_order and len(elem_ids) > 0:
+                    mesh.addVolumes(elem_nodes.ravel().tolist(), elem_nodes.shape[1], elem_ids.tolist())
+            if len(node_ids) > 0:
                 MeshObject = FreeCAD.ActiveDocument.addObject('Fem::FemMeshObject', 'ResultMesh')
                 MeshObject.FemMesh = mesh
                 AnalysisObject.Member = AnalysisObject.Member + [MeshObject]
 
+        disp_values = numpy.empty((0, 3))
         if 'Displacement' in m:
-            disp = m['Displacement']
-            if len(disp) > 0:
-                results.DisplacementVectors = disp.values()
-                results.ElementNumbers = disp.keys()
+            disp_ids, disp_values = m['Displacement']
+            if len(disp_ids) > 0:
+                results.DisplacementVectors = map(tuple, disp_values.tolist())
+                results.ElementNumbers = disp_ids.tolist()
                 if(MeshObject):
                     results.Mesh = MeshObject
+        mstress = numpy.empty(0)
+        principal = numpy.empty((0, 3))
         if 'Stress' in m:
-            stress = m['Stress']
-            if len(stress) > 0:
-                for i in stress.values():
-                    # Von mises stress (http://en.wikipedia.org/wiki/Von_Mises_yield_criterion)
-                    s11 = i[0]
-                    s22 = i[1]
-                    s33 = i[2]
-                    s12 = i[3]
-                    s23 = i[4]
-                    s31 = i[5]
-                    s11s22 = pow(s11 - s22, 2)
-                    s22s33 = pow(s22 - s33, 2)
-                    s33s11 = pow(s33 - s11, 2)
-                    s12s23s31 = 6 * (pow(s12, 2) + pow(s23, 2) * pow(s31, 2))
-                    mstress.append(sqrt(0.5 * (s11s22 + s22s33 + s33s11 + s12s23s31)))
-
-                results.StressValues = mstress
-                if (results.ElementNumbers != 0 and results.ElementNumbers != stress.keys()):
+            stress_ids, stress_values = m['Stress']
+            if len(stress_ids) > 0:
+                mstress = calculate_von_mises(stress_values)
+                principal = calculate_principal_stress(stress_values)
+                results.StressValues = mstress.tolist()
+                results.PrincipalMax = principal[:, 0].tolist()
+                results.PrincipalMed = principal[:, 1].tolist()
+                results.PrincipalMin = principal[:, 2].tolist()
+                if (results.ElementNumbers != 0 and results.ElementNumbers != stress_ids.tolist()):
                     print "Inconsistent FEM results: element number for Stress doesn't equal element number for Displacement"
-                    results.ElementNumbers = stress.keys()
+                    results.ElementNumbers = stress_ids.tolist()
                 if(MeshObject):
                     results.Mesh = MeshObject
 
-        l = len(displacement)
-        x_max, y_max, z_max = map(max, zip(*displacement))
-        x_min, y_min, z_min = map(min, zip(*displacement))
-        sum_list = map(sum, zip(*displacement))
-        x_avg, y_avg, z_avg = [i / l for i in sum_list]
-        s_max = max(mstress)
-        s_min = min(mstress)
-        s_avg = sum(mstress) / l
-        disp_abs = []
-        for d in displacement:
-            disp_abs.append(sqrt(pow(d[0], 2) + pow(d[1], 2) + pow(d[2], 2)))
-        results.DisplacementLengths = disp_abs
-        a_max = max(disp_abs)
-        a_min = min(disp_abs)
-        a_avg = sum(disp_abs) / l
-        results.Stats = [x_min, x_avg, x_max,
-                         y_min, y_avg, y_max,
-                         z_min, z_avg, z_max,
-                         a_min, a_avg, a_max,
-                         s_min, s_avg, s_max]
+        disp_abs = numpy.sqrt((disp_values ** 2).sum(axis=1))
+        results.DisplacementLengths = disp_abs.tolist()
+        results.Stats = (calculate_stats(disp_values) + calculate_stats(disp_abs) +
+                         calculate_stats(mstress) + calculate_stats(principal))
         AnalysisObject.Member = AnalysisObject.Member + [results]
 
         if(FreeCAD.GuiUp):
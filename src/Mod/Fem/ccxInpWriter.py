@@ -4,6 +4,95 @@ import sys
 import time
 
 
+# calculate the appropriate node areas for every node of every mesh face
+# G. Lakshmi Narasaiah, Finite Element Analysis, p206ff
+# face_table is { meshfaceID : ( nodeID, ... , nodeID ) }, nodes the FemMesh.Nodes dict
+# returns { nodeID : Area }, the sum of the areas of each node over all mesh faces
+def get_node_areas(face_table, nodes):
+    try:
+        import numpy
+    except ImportError:
+        return get_node_areas_loop(face_table, nodes)
+
+    def get_triangle_areas(P1, P2, P3):
+        return 0.5 * numpy.sqrt((numpy.cross(P2 - P1, P3 - P1) ** 2).sum(axis=1))
+
+    face_nodes = [face_table[mf] for mf in face_table if len(face_table[mf]) in (3, 6)]
+    node_ids = numpy.array([n for fn in face_nodes for n in fn], numpy.int64)
+    face_size = numpy.array([len(fn) for fn in face_nodes], numpy.int64)
+    if len(node_ids) == 0:
+        return {}
+    P = numpy.array([(nodes[n].x, nodes[n].y, nodes[n].z) for n in node_ids.tolist()])
+    # position of the first node of each face in node_ids
+    first = numpy.cumsum(face_size) - face_size
+    node_area = numpy.zeros(len(node_ids))
+
+    # 3 node mesh face triangle
+    # corner_node_area = mesh_face_area / 3.0
+    #      P3
+    #      /\
+    #     /  \
+    #    /____\
+    #  P1      P2
+    i = first[face_size == 3]
+    corner_node_area = get_triangle_areas(P[i], P[i + 1], P[i + 2]) / 3.0
+    for k in range(3):
+        node_area[i + k] = corner_node_area
+
+    # 6 node mesh face triangle
+    # corner_node_area = 0
+    # middle_node_area = mesh_face_area / 3.0
+    #         P3
+    #         /\
+    #        /t3\
+    #       /    \
+    #     P6------P5
+    #     / \ t4 / \
+    #    /t1 \  /t2 \
+    #   /_____\/_____\
+    # P1      P4      P2
+    i = first[face_size == 6]
+    mesh_face_area = (get_triangle_areas(P[i], P[i + 3], P[i + 5]) +
+                      get_triangle_areas(P[i + 1], P[i + 4], P[i + 3]) +
+                      get_triangle_areas(P[i + 2], P[i + 5], P[i + 4]) +
+                      get_triangle_areas(P[i + 3], P[i + 4], P[i + 5]))
+    middle_node_area = mesh_face_area / 3.0
+    for k in range(3, 6):
+        node_area[i + k] = middle_node_area
+
+    # sum up the areas per node, some nodes belong to more than one mesh face
+    unique_ids, index = numpy.unique(node_ids, return_inverse=True)
+    sum_area = numpy.bincount(index, weights=node_area)
+    return dict(zip(unique_ids.tolist(), sum_area.tolist()))
+
+
+# get_node_areas without numpy, one mesh face after the other
+def get_node_areas_loop(face_table, nodes):
+
+    def get_triangle_area(P1, P2, P3):
+        return 0.5 * (P2 - P1).cross(P3 - P1).Length
+
+    node_sumarea_table = {}
+    for mf in face_table:
+        fn = face_table[mf]
+        if len(fn) == 3:
+            corner_node_area = get_triangle_area(nodes[fn[0]], nodes[fn[1]], nodes[fn[2]]) / 3.0
+            node_areas = [corner_node_area] * 3
+        elif len(fn) == 6:
+            P = [nodes[n] for n in fn]
+            mesh_face_area = (get_triangle_area(P[0], P[3], P[5]) +
+                              get_triangle_area(P[1], P[4], P[3]) +
+                              get_triangle_area(P[2], P[5], P[4]) +
+                              get_triangle_area(P[3], P[4], P[5]))
+            middle_node_area = mesh_face_area / 3.0
+            node_areas = [0.0] * 3 + [middle_node_area] * 3
+        else:
+            continue
+        for n, area in zip(fn, node_areas):
+            node_sumarea_table[n] = node_sumarea_table.get(n, 0.0) + area
+    return node_sumarea_table
+
+
 class inp_writer:
     def __init__(self, analysis_obj, mesh_obj, mat_obj, fixed_obj, force_obj, pressure_obj, dir_name=None):
         self.dir_name = dir_name
@@ -158,16 +247,10 @@ class inp_writer:
             f.write(fix_obj_name + ',3\n\n')
 
     def write_constraints_force(self, f):
-
-        def getTriangleArea(P1, P2, P3):
-            vec1 = P2 - P1
-            vec2 = P3 - P1
-            vec3 = vec1.cross(vec2)
-            return 0.5 * vec3.Length
-
         f.write('\n***********************************************************\n')
         f.write('** Node loads\n')
         f.write('** written by {} function\n'.format(sys._getframe().f_code.co_name))
+        femnodes = None
         for fobj in self.force_objects:
             frc_obj = fobj['Object']
             if 'NodeLoad' in fobj:
@@ -205,102 +288,34 @@ class inp_writer:
                     f.write('*CLOAD\n')
                     f.write('** node loads on element face: ' + o.Name + '.' + elem + '\n')
 
+                    # the node dict is rebuilt by every FemMesh.Nodes call, fetch it only once
+                    if femnodes is None:
+                        femnodes = self.mesh_object.FemMesh.Nodes
                     volume_faces = self.mesh_object.FemMesh.getVolumesByFace(ref_face)
                     face_table = {}  # { meshfaceID : ( nodeID, ... , nodeID ) }
                     for mv, mf in volume_faces:
                         face_table[mf] = self.mesh_object.FemMesh.getElementNodes(mf)
 
-                    # calulate the appropriate node_areas for every node of every mesh face (mf)
-                    # G. Lakshmi Narasaiah, Finite Element Analysis, p206ff
-
-                    #  [ (nodeID,Area), ... , (nodeID,Area) ]  some nodes will have more than one entry
-                    node_area_table = []
                     #  { nodeID : Area, ... , nodeID:Area }  AreaSum for each node, one entry for each node
-                    node_sumarea_table = {}
-                    mesh_face_area = 0
-                    for mf in face_table:
-                        # print '    ', mf, ' --> ', face_table[mf]
-                        if len(face_table[mf]) == 3:  # 3 node mesh face triangle
-                            # corner_node_area = mesh_face_area / 3.0
-                            #      P3
-                            #      /\
-                            #     /  \
-                            #    /____\
-                            #  P1      P2
-                            P1 = self.mesh_object.FemMesh.Nodes[face_table[mf][0]]
-                            P2 = self.mesh_object.FemMesh.Nodes[face_table[mf][1]]
-                            P3 = self.mesh_object.FemMesh.Nodes[face_table[mf][2]]
-
-                            mesh_face_area = getTriangleArea(P1, P2, P3)
-                            corner_node_area = mesh_face_area / 3.0
-
-                            node_area_table.append((face_table[mf][0], corner_node_area))
-                            node_area_table.append((face_table[mf][1], corner_node_area))
-                            node_area_table.append((face_table[mf][2], corner_node_area))
-
-                        if len(face_table[mf]) == 6:  # 6 node mesh face triangle
-                            # corner_node_area = 0
-                            # middle_node_area = mesh_face_area / 3.0
-                            #         P3
-                            #         /\
-                            #        /t3\
-                            #       /    \
-                            #     P6------P5
-                            #     / \ t4 / \
-                            #    /t1 \  /t2 \
-                            #   /_____\/_____\
-                            # P1      P4      P2
-                            P1 = self.mesh_object.FemMesh.Nodes[face_table[mf][0]]
-                            P2 = self.mesh_object.FemMesh.Nodes[face_table[mf][1]]
-                            P3 = self.mesh_object.FemMesh.Nodes[face_table[mf][2]]
-                            P4 = self.mesh_object.FemMesh.Nodes[face_table[mf][3]]
-                            P5 = self.mesh_object.FemMesh.Nodes[face_table[mf][4]]
-                            P6 = self.mesh_object.FemMesh.Nodes[face_table[mf][5]]
-
-                            mesh_face_t1_area = getTriangleArea(P1, P4, P6)
-                            mesh_face_t2_area = getTriangleArea(P2, P5, P4)
-                            mesh_face_t3_area = getTriangleArea(P3, P6, P5)
-                            mesh_face_t4_area = getTriangleArea(P4, P5, P6)
-                            mesh_face_area = mesh_face_t1_area + mesh_face_t2_area + mesh_face_t3_area + mesh_face_t4_area
-                            middle_node_area = mesh_face_area / 3.0
-
-                            node_area_table.append((face_table[mf][0], 0))
-                            node_area_table.append((face_table[mf][1], 0))
-                            node_area_table.append((face_table[mf][2], 0))
-                            node_area_table.append((face_table[mf][3], middle_node_area))
-                            node_area_table.append((face_table[mf][4], middle_node_area))
-                            node_area_table.append((face_table[mf][5], middle_node_area))
-
-                    # node_sumarea_table
-                    for n, A in node_area_table:
-                        # print n, ' --> ', A
-                        if n in node_sumarea_table:
-                            node_sumarea_table[n] = node_sumarea_table[n] + A
-                        else:
-                            node_sumarea_table[n] = A
-
-                    sum_node_areas = 0
-                    for n in node_sumarea_table:
-                        # print n, ' --> ', node_sumarea_table[n]
-                        sum_node_areas = sum_node_areas + node_sumarea_table[n]
+                    node_sumarea_table = get_node_areas(face_table, femnodes)
+
+                    sum_node_areas = sum(node_sumarea_table.values())
                     print '    sum_node_areas ', sum_node_areas, ' ref_face.Area: ', ref_face.Area
                     sum_ref_face_node_area += sum_node_areas
 
                     # write CLOAD lines to CalculiX file
                     vec = frc_obj.DirectionVector
+                    cload_lines = []
                     for n in sorted(node_sumarea_table):
                         node_load = node_sumarea_table[n] * force_per_sum_ref_face_area
                         sum_node_load += node_load
-                        #print '    nodeID: ', n, '  nodeload: ', node_load
                         if (vec.x != 0.0):
-                            v1 = "{:.13E}".format(vec.x * node_load)
-                            f.write(str(n) + ',1,' + v1 + '\n')
+                            cload_lines.append("{},1,{:.13E}\n".format(n, vec.x * node_load))
                         if (vec.y != 0.0):
-                            v2 = "{:.13E}".format(vec.y * node_load)
-                            f.write(str(n) + ',2,' + v2 + '\n')
+                            cload_lines.append("{},2,{:.13E}\n".format(n, vec.y * node_load))
                         if (vec.z != 0.0):
-                            v3 = "{:.13E}".format(vec.z * node_load)
-                            f.write(str(n) + ',3,' + v3 + '\n')
+                            cload_lines.append("{},3,{:.13E}\n".format(n, vec.z * node_load))
+                    f.write(''.join(cload_lines))
                 f.write('\n')
 
             # print '  sum_ref_face_node_area: ', sum_ref_face_node_area
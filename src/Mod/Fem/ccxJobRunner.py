@@ -0,0 +1,207 @@
+#***************************************************************************
+#*                                                                         *
+#*   Copyright (c) 2015 - FreeCAD Developers                               *
+#*                                                                         *
+#*   This program is free software; you can redistribute it and/or modify  *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)    *
+#*   as published by the Free Software Foundation; either version 2 of     *
+#*   the License, or (at your option) any later version.                   *
+#*   for detail see the LICENCE text file.                                 *
+#*                                                                         *
+#*   This program is distributed in the hope that it will be useful,       *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+#*   GNU Library General Public License for more details.                  *
+#*                                                                         *
+#*   You should have received a copy of the GNU Library General Public     *
+#*   License along with this program; if not, write to the Free Software   *
+#*   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+#*   USA                                                                   *
+#*                                                                         *
+#***************************************************************************
+
+
+import FreeCAD
+import FemTools
+import multiprocessing
+import os
+import Queue
+import subprocess
+import threading
+import time
+
+__title__ = "FreeCAD CalculiX job runner"
+__author__ = "FreeCAD Developers"
+__url__ = "http://www.freecadweb.org"
+
+
+class ccx_job:
+    def __init__(self, analysis, working_dir):
+        self.analysis = analysis
+        self.working_dir = working_dir
+        # queued, running, finished, failed or cancelled
+        self.status = "queued"
+        self.message = ""
+        self.returncode = None
+        self.output = []
+        self.fea = None
+        self.process = None
+        self.reader = None
+
+    def cancel(self):
+        if self.status == "running" and self.process:
+            self.process.terminate()
+        if self.status in ("queued", "running"):
+            self.status = "cancelled"
+
+
+## Runs CalculiX for many analyses, several ccx processes at the same time
+#  Works without GUI, e.g. from FreeCADCmd:
+#  runner = ccxJobRunner.ccx_runner(threads=2)
+#  for a in analyses:
+#      runner.add(a)
+#  runner.run()
+#  The input files are written and the results are imported in the calling thread,
+#  only the ccx processes run in parallel.
+class ccx_runner:
+    def __init__(self, working_dir=None, ccx_binary=None, jobs=None, threads=None, progress=None):
+        cpu_count = multiprocessing.cpu_count()
+        if threads is None:
+            threads = 1 if jobs is None else max(1, cpu_count // jobs)
+        if jobs is None:
+            jobs = max(1, cpu_count // threads)
+        # number of ccx processes running at the same time and OMP_NUM_THREADS of each of them
+        self.max_jobs = jobs
+        self.threads = threads
+        self.ccx_binary = ccx_binary
+        if working_dir is None:
+            fem_prefs = FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Fem")
+            working_dir = fem_prefs.GetString("WorkingDir", "/tmp")
+        self.working_dir = working_dir
+        # called with the job and a message for every state change and line of ccx output
+        self.progress = progress if progress else self.print_progress
+        self.jobs = []
+        self.cancelled = False
+
+    def print_progress(self, job, message):
+        FreeCAD.Console.PrintMessage("{}: {}\n".format(job.analysis.Name, message.rstrip()))
+
+    def add(self, analysis, working_dir=None):
+        # every analysis gets its own directory, the input file is named after the mesh
+        if working_dir is None:
+            working_dir = os.path.join(self.working_dir, analysis.Name)
+        job = ccx_job(analysis, working_dir)
+        self.jobs.append(job)
+        return job
+
+    ## cancels all queued and running jobs, can be called from the progress callback or another thread
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self, load_results=True, poll_interval=0.1):
+        self.cancelled = False
+        pending = [j for j in self.jobs if j.status == "queued"]
+        running = []
+        messages = Queue.Queue()
+        try:
+            while pending or running:
+                while pending and len(running) < self.max_jobs and not self.cancelled:
+                    job = pending.pop(0)
+                    if self.start_job(job, messages):
+                        running.append(job)
+                self.report(messages)
+                for job in running[:]:
+                    if self.cancelled:
+                        job.cancel()
+                    if job.process.poll() is not None:
+                        running.remove(job)
+                        self.finish_job(job, messages, load_results)
+                if self.cancelled:
+                    for job in pending:
+                        job.cancel()
+                        self.progress(job, "cancelled")
+                    pending = []
+                if running:
+                    time.sleep(poll_interval)
+            self.report(messages)
+        finally:
+            # something went wrong in here or in the progress callback,
+            # don't leave ccx processes behind
+            for job in running:
+                job.cancel()
+                job.process.wait()
+        return [j for j in self.jobs if j.status == "finished"]
+
+    def start_job(self, job, messages):
+        job.fea = FemTools.FemTools(job.analysis)
+        job.message = job.fea.check_prerequisites()
+        if job.message:
+            job.status = "failed"
+            self.progress(job, "failed: " + job.message)
+            return False
+        try:
+            if not os.path.isdir(job.working_dir):
+                os.makedirs(job.working_dir)
+            job.fea.setup_working_dir(job.working_dir)
+            job.fea.write_inp_file()
+            ccx_binary = self.ccx_binary if self.ccx_binary else job.fea.ccx_binary
+            env = dict(os.environ)
+            env['OMP_NUM_THREADS'] = str(self.threads)
+            # ccx is started in the directory of the input file, see FemTools.start_ccx
+            job.process = subprocess.Popen([ccx_binary, "-i", os.path.basename(job.fea.base_name)],
+                                           cwd=os.path.dirname(job.fea.base_name),
+                                           stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                           shell=False, env=env)
+        except Exception as e:
+            # e.g. no ccx binary or the input file couldn't be written, the other jobs go on
+            job.process = None
+            job.status = "failed"
+            job.message = str(e)
+            self.progress(job, "failed: " + job.message)
+            return False
+        job.reader = threading.Thread(target=self.read_output, args=(job, messages))
+        job.reader.daemon = True
+        job.reader.start()
+        job.status = "running"
+        self.progress(job, "started with {} thread(s)".format(self.threads))
+        return True
+
+    # runs in a thread per job, the pipe has to be drained or ccx blocks
+    def read_output(self, job, messages):
+        for line in iter(job.process.stdout.readline, ''):
+            messages.put((job, line))
+        job.process.stdout.close()
+
+    def report(self, messages):
+        while True:
+            try:
+                job, line = messages.get_nowait()
+            except Queue.Empty:
+                return
+            job.output.append(line)
+            self.progress(job, line)
+
+    def finish_job(self, job, messages, load_results):
+        job.reader.join()
+        self.report(messages)
+        job.returncode = job.process.returncode
+        if job.status == "cancelled":
+            self.progress(job, "cancelled")
+        elif job.returncode != 0:
+            job.status = "failed"
+            self.progress(job, "failed with exit code {}".format(job.returncode))
+        else:
+            if load_results:
+                job.fea.purge_results()
+                job.fea.load_results()
+            job.status = "finished"
+            self.progress(job, "finished")
+
+
+## runs all analyses and imports their results, returns the jobs
+def run_analyses(analyses, working_dir=None, jobs=None, threads=None, progress=None):
+    runner = ccx_runner(working_dir, jobs=jobs, threads=threads, progress=progress)
+    for analysis in analyses:
+        runner.add(analysis)
+    runner.run()
+    return runner.jobs
@@ -0,0 +1,110 @@
+# Copyright (c) 2014, Juergen Riegel (FreeCAD@juergen-riegel.net)
+# All rights reserved.
+
+# This file is part of the StepClassLibrary (SCL).
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+#   Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+#   Neither the name of the <ORGANIZATION> nor the names of its contributors may
+#   be used to endorse or promote products derived from this software without
+#   specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Benchmark of the serial and the parallel Part21 parser
+
+Generates a large Part21 file by repeating the DATA section of a sample
+file with renumbered instances, parses it serially and with a process
+pool and checks that both give the same result.
+
+    python BenchmarkPart21.py [sample file] [copies] [processes]
+"""
+
+import Part21,os,re,sys,tempfile,time
+
+
+
+__title__="Part21 parser benchmark"
+__author__ = "Juergen Riegel"
+__version__ = "0.1 (Jan 2014)"
+
+INSTANCE_RE = re.compile(r'#(\d+)')
+
+
+def generateFile(sample, copies, filename):
+    """Write a Part21 file with the DATA section of sample repeated copies
+    times, the instance ids of every copy shifted past the previous one"""
+    f = open(sample, 'rb')
+    text = f.read()
+    f.close()
+    start = text.index('DATA;') + len('DATA;')
+    end = text.rindex('ENDSEC;')
+    data = text[start:end]
+    step = max(int(i) for i in INSTANCE_RE.findall(data))
+    out = open(filename, 'wb')
+    out.write(text[:start])
+    for n in range(copies):
+        offset = n*step
+        out.write(INSTANCE_RE.sub(lambda m: '#%i'%(int(m.group(1))+offset), data))
+    out.write(text[end:])
+    out.close()
+
+
+def run(sample, copies, processes):
+    """Parse the generated file serially and in parallel, return the timings"""
+    fd, filename = tempfile.mkstemp(suffix='.p21')
+    os.close(fd)
+    try:
+        generateFile(sample, copies, filename)
+        print "%s x%i: %.1f MB"%(sample, copies, os.path.getsize(filename)/1048576.0)
+        init_time = time.time()
+        serial = Part21.Part21Parser(filename)
+        serial_time = time.time()-init_time
+        # smaller files would be parsed serially
+        min_size = Part21.PARALLEL_MIN_SIZE
+        Part21.PARALLEL_MIN_SIZE = 0
+        try:
+            init_time = time.time()
+            parallel = Part21.Part21Parser(filename, processes)
+            parallel_time = time.time()-init_time
+        finally:
+            Part21.PARALLEL_MIN_SIZE = min_size
+        if serial._schema_name != parallel._schema_name:
+            raise ValueError("Different schema names: %s, %s"%(serial._schema_name, parallel._schema_name))
+        if serial._instances_definition != parallel._instances_definition:
+            raise ValueError("The serial and the parallel parser give different instances")
+    finally:
+        os.remove(filename)
+    print "serial: %fs, %i processes: %fs, results are identical"%(serial_time, processes, parallel_time)
+    return serial_time, parallel_time
+
+
+if __name__ == "__main__":
+    sample = 'gasket1.p21'
+    copies = 500
+    processes = 4
+    if len(sys.argv) > 1:
+        sample = sys.argv[1]
+    if len(sys.argv) > 2:
+        copies = int(sys.argv[2])
+    if len(sys.argv) > 3:
+        processes = int(sys.argv[3])
+    run(sample, copies, processes)
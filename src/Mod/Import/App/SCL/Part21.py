@@ -29,12 +29,126 @@
 # (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
 # THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import marshal
+import os
 import re
-import Utils
+import string
 import time
+from itertools import islice
 
+# one statement, up to the ';' that is neither inside a string nor inside a comment
+STATEMENT_RE = re.compile(r"[^;'/]*(?:(?:'[^']*'|/\*.*?\*/|/)[^;'/]*)*;", re.S)
+# the tokens of a statement: strings (quotes kept), comments, delimiters, and everything else
+# (instance names, numbers, enumerations, keywords, $, *, binaries) as one token each
+TOKEN_RE = re.compile(r"'[^']*(?:''[^']*)*'|/\*.*?\*/|[(),;=]|[^\s(),;=/']+", re.S)
+# first characters of entity and type names, user defined ones start with '!'
+KEYWORD_START = frozenset(string.ascii_letters + '!')
+# where a chunk of the DATA section may start: the end of a line that closes a
+# statement, followed by an instance name
+CHUNK_START_RE = re.compile(r";[ \t\r]*\n(?=[ \t\r\n]*#\d+[ \t]*=)")
+# files smaller than this are always parsed in one process
+PARALLEL_MIN_SIZE = 4*1024*1024
 
-INSTANCE_DEFINITION_RE = re.compile("#(\d+)[^\S\n]?=[^\S\n]?(.*?)\((.*)\)[^\S\n]?;[\\r]?$")
+
+def parse_parameters(tokens, start):
+    """ Build the nested parameter list of the tokens following the opening
+    parenthesis tokens[start] up to the matching closing one.
+    ["(", "'A'", ",", "(", "#5", ",", "#6", ")", ",", "LENGTH_MEASURE", "(", "2.", ")", ")"]
+    results in:
+    ["'A'", ['#5', '#6'], ('LENGTH_MEASURE', ['2.'])]
+    Typed parameters and the partial entities of complex instances are (name, parameters) tuples.
+    """
+    result = []
+    current = result
+    stack = []
+    name = None
+    for token in islice(tokens, start + 1, None):
+        if token == ',':
+            continue
+        if token == ')':
+            if not stack:
+                break
+            current = stack.pop()
+        elif token == '(':
+            child = []
+            if name is None:
+                current.append(child)
+            else:
+                current.append((name, child))
+                name = None
+            stack.append(current)
+            current = child
+        elif token[0] in KEYWORD_START:
+            name = token
+        else:
+            current.append(token)
+    return result
+
+def parse_statements(text, instances_definition):
+    """ Tokenize and parse all statements of text in a single pass.
+    Instances are stored in instances_definition as id: (entity_name, attributes),
+    a complex instance #1=(A(...)B(...)); gets an empty entity name and a list of
+    (name, attributes) tuples, one per partial entity.
+    Returns the schema name if text contains the FILE_SCHEMA header, else "".
+    """
+    schema_name = ""
+    for match in STATEMENT_RE.finditer(text):
+        statement = match.group()
+        tokens = TOKEN_RE.findall(statement)
+        if '/*' in statement:
+            tokens = [t for t in tokens if not t.startswith('/*')]
+        if len(tokens) > 2 and tokens[1] == '=' and tokens[0][0] == '#':
+            if tokens[2] == '(':
+                entity_name = ''
+                attributes = parse_parameters(tokens, 2)
+            else:
+                entity_name = tokens[2]
+                attributes = parse_parameters(tokens, 3)
+            instances_definition[int(tokens[0][1:])] = (entity_name, attributes)
+        elif tokens and tokens[0] == 'FILE_SCHEMA':
+            #identify the schema name
+            schema = [t for t in tokens if t[0] == "'"][0]
+            schema_name = schema[1:-1].split(" ")[0].lower()
+    return schema_name
+
+def find_chunks(filename, count):
+    """ Split a file into at most count (start, end) byte ranges that begin and
+    end at statement boundaries, see CHUNK_START_RE.
+    """
+    size = os.path.getsize(filename)
+    bounds = [0]
+    fp = open(filename, 'rb')
+    for n in range(1, count):
+        offset = max(size*n//count, bounds[-1])
+        fp.seek(offset)
+        # statements are rarely longer than a few lines, read on until a boundary shows up
+        text = ''
+        while True:
+            block = fp.read(65536)
+            text += block
+            match = CHUNK_START_RE.search(text)
+            if match or not block:
+                break
+        if not match:
+            break
+        bounds.append(offset + match.end())
+    fp.close()
+    bounds.append(size)
+    return [(bounds[n], bounds[n+1]) for n in range(len(bounds)-1) if bounds[n] < bounds[n+1]]
+
+def parse_chunk(chunk):
+    """ Parse the statements of the byte range (filename, start, end), the worker
+    of Part21Parser.parse_file_parallel. Returns (schema_name, instances_definition),
+    marshalled: that is several times faster than the pickling of the pool.
+    """
+    filename, start, end = chunk
+    fp = open(filename, 'rb')
+    fp.seek(start)
+    text = fp.read(end - start)
+    fp.close()
+    instances_definition = {}
+    schema_name = parse_statements(text, instances_definition)
+    return marshal.dumps((schema_name, instances_definition))
 
 def map_string_to_num(stri):
     """ Take a string, check wether it is an integer, a float or not
@@ -97,9 +211,11 @@ class Part21Parser:
     self._instance_definition : stores attibutes, key is the instance integer id
     self._number_of_ancestors : stores the number of ancestors of entity id. This enables
     to define the order of instances creation.
+    With processes > 1, large files are parsed by a pool of that many processes.
     """
-    def __init__(self, filename):
+    def __init__(self, filename, processes=None):
         self._filename = filename
+        self._processes = processes
         # the schema
         self._schema_name = ""
         # the dict self._instances contain instance definition
@@ -125,36 +241,55 @@ class Part21Parser:
     def parse_file(self):
         init_time = time.time()
         print "Parsing file %s..."%self._filename,
-        fp = open(self._filename)
-        while True:
-            line = fp.readline()
-            if not line:
-                break
-            # there may be a multline definition. In this case, we read lines untill we found
-            # a ;
-            while (line.find(';') == -1): #its a multiline
-                line = line.replace("\n","").replace("\r","") + fp.readline()
-            # parse line
-            match_instance_definition = INSTANCE_DEFINITION_RE.search(line)  # id,name,attrs
-            if match_instance_definition:
-                instance_id, entity_name, entity_attrs = match_instance_definition.groups()
-                instance_int_id = int(instance_id)
-                # find number of ancestors
-                #number_of_ancestors = entity_attrs.count('#')
-                # fill number of ancestors dict
-                #self._number_of_ancestors[number_of_ancestors].append(instance_int_id) # this kind of sorting don't work on non-trivial files
-                # parse attributes string
-                entity_attrs_list, str_len = Utils.process_nested_parent_str(entity_attrs)
-                # then finally append this instance to the disct instance
-                self._instances_definition[instance_int_id] = (entity_name,entity_attrs_list)
-            else: #does not match with entity instance definition, parse the header
-                if line.startswith('FILE_SCHEMA'):
-                    #identify the schema name
-                    self._schema_name = line.split("'")[1].split("'")[0].split(" ")[0].lower()
-        fp.close()
+        # the workers are forked processes, without fork the file is parsed serially
+        if self._processes > 1 and hasattr(os, "fork") and os.path.getsize(self._filename) >= PARALLEL_MIN_SIZE:
+            self.parse_file_parallel(self._processes)
+        else:
+            self.parse_file_serial()
         print 'done in %fs.'%(time.time()-init_time)
         print 'schema: - %s entities %i'%(self._schema_name,len(self._instances_definition.keys()))
 
+    def parse_file_serial(self):
+        fp = open(self._filename)
+        self.parse_statements(fp.read())
+        fp.close()
+
+    def parse_file_parallel(self, processes):
+        """ Split the file into byte ranges at statement boundaries, parse them in
+        a process pool and merge the instance dicts. A few chunks per process
+        keep the workers busy if the statements are unevenly spread.
+        Without fork the file is parsed serially.
+        """
+        if not hasattr(os, "fork"):
+            self.parse_file_serial()
+            return
+        import multiprocessing
+        chunks = [(self._filename, start, end) for start, end in find_chunks(self._filename, processes*4)]
+        pool = multiprocessing.Pool(processes)
+        done = False
+        try:
+            for result in pool.imap(parse_chunk, chunks):
+                schema_name, instances = marshal.loads(result)
+                if schema_name:
+                    self._schema_name = schema_name
+                self._instances_definition.update(instances)
+            done = True
+        finally:
+            # don't wait for the remaining chunks if one failed
+            if done:
+                pool.close()
+            else:
+                pool.terminate()
+            pool.join()
+
+    def parse_statements(self, text):
+        """ Parse the statements of text into self._instances_definition,
+        see the parse_statements function
+        """
+        schema_name = parse_statements(text, self._instances_definition)
+        if schema_name:
+            self._schema_name = schema_name
+
 class EntityInstancesFactory(object):
     '''
     This class creates entity instances from the str definition
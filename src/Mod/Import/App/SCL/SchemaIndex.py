@@ -0,0 +1,284 @@
+# Copyright (c) 2014, Juergen Riegel (FreeCAD@juergen-riegel.net)
+# All rights reserved.
+
+# This file is part of the StepClassLibrary (SCL).
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+#   Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+#   Neither the name of the <ORGANIZATION> nor the names of its contributors may
+#   be used to endorse or promote products derived from this software without
+#   specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Compact index of the generated EXPRESS schema modules
+
+The schema modules (config_control_design.py, automotive_design.py,
+ifc2x3.py, ...) are tens of thousands of lines long. Importing one
+compiles and executes all of it, although a STEP file only uses a few
+dozen of its entities. Instead the module source is scanned once into
+an index of its top level definitions (entity supertypes and attributes,
+the source range of every definition and the schema names it uses),
+which is cached on disk in the user data directory (or in the temp
+directory) and rebuilt when the module changes. An index shipped next to
+the module is used as well, but never written there. Classes are then created only for
+the requested entities and the definitions they depend on.
+
+    schema = SchemaIndex.getSchema('config_control_design')
+    schema.getAttributes('cartesian_point')
+    cls = schema.getClass('cartesian_point')
+"""
+
+import os,sys,re,imp,types,marshal,tempfile
+
+
+
+__title__="EXPRESS schema index"
+__author__ = "Juergen Riegel"
+__version__ = "0.1 (Jan 2014)"
+
+# bump when the layout of the cached index changes
+INDEX_VERSION = 2
+
+# start of a top level definition: class, function or assignment (SELECT, SET, Rule, ...)
+DEFINITION_RE = re.compile(r'^(?:class|def)[ \t]+(\w+)|^(\w+)[ \t]*=', re.M)
+CLASS_RE = re.compile(r'class[ \t]+\w+[ \t]*\(([^)]*)\)[ \t]*:')
+INIT_RE = re.compile(r'^\tdef __init__\([ \t]*self[ \t]*,([^)]*)\)', re.M)
+NAME_RE = re.compile(r'[A-Za-z_]\w*')
+COMMENT_RE = re.compile(r'^[ \t]*#.*$', re.M)
+
+# set in the header of every schema module, not definitions of their own
+HEADER_NAMES = ('schema_name', 'schema_scope')
+
+# schema name -> Schema, shared by all readers
+_schemas = {}
+
+
+def getSchema(schema_name, cache_dir=None):
+    """Return the Schema for a schema module name, e.g. 'automotive_design',
+    or None if no such module is found on the path. The index is loaded
+    once and shared by all callers."""
+    schema_name = schema_name.lower()
+    if not _schemas.has_key(schema_name):
+        try:
+            module_file, path, description = imp.find_module(schema_name)
+        except ImportError:
+            return None
+        if module_file:
+            module_file.close()
+        if description[2] != imp.PY_SOURCE:
+            return None
+        _schemas[schema_name] = Schema(schema_name, path, cache_dir)
+    return _schemas[schema_name]
+
+
+def buildIndex(source):
+    """Scan the source of a schema module into a dict of plain
+    (marshal-able) containers:
+    header: source of the imports in front of the first definition
+    ranges: name -> (start, end, line) of its definition in the source
+    bases: name -> list of base class names
+    attributes: name -> list of the __init__ parameters of an entity,
+      inherited attributes first, in Part21 order
+    uses: name -> list of the other schema names its definition refers to
+    """
+    starts = []
+    for m in DEFINITION_RE.finditer(source):
+        name = m.group(1) or m.group(2)
+        if name not in HEADER_NAMES:
+            starts.append((m.start(), name))
+    ranges = {}
+    bases = {}
+    attributes = {}
+    line = 0
+    previous = 0
+    for n, (start, name) in enumerate(starts):
+        if n + 1 < len(starts):
+            end = starts[n + 1][0]
+        else:
+            end = len(source)
+        line += source.count('\n', previous, start)
+        previous = start
+        ranges[name] = (start, end, line)
+        m = CLASS_RE.match(source, start, end)
+        if m:
+            bases[name] = [b.strip() for b in m.group(1).split(',') if b.strip()]
+            m = INIT_RE.search(source, start, end)
+            if m:
+                attributes[name] = [a.strip() for a in m.group(1).split(',') if a.strip() and a.strip()[0] != '*']
+    uses = {}
+    for name, (start, end, line) in ranges.iteritems():
+        # names in strings count as well, SELECT and aggregation types refer to
+        # their members by name and look them up in the schema scope. The
+        # comment heading the next definition doesn't.
+        used = set(NAME_RE.findall(COMMENT_RE.sub('', source[start:end])))
+        used.discard(name)
+        uses[name] = [u for u in used if ranges.has_key(u)]
+    if starts:
+        header = source[:starts[0][0]]
+    else:
+        header = source
+    return {'header': header, 'ranges': ranges, 'bases': bases,
+            'attributes': attributes, 'uses': uses}
+
+
+class Schema(object):
+    """Index of one schema module and the module object the requested
+    definitions are created in (the schema scope)"""
+    def __init__(self, schema_name, path, cache_dir=None):
+        self.schema_name = schema_name
+        self.path = path
+        self._source = None
+        self._index = self._loadIndex(cache_dir)
+        self._ranges = self._index['ranges']
+        self.module = types.ModuleType(schema_name)
+        self.module.__file__ = path
+        scope = vars(self.module)
+        exec compile(self._index['header'].replace('schema_scope = sys.modules[__name__]', ''), path, 'exec') in scope
+        scope['schema_name'] = schema_name
+        scope['schema_scope'] = self.module
+        # definitions that fail (the generator emits invalid python for some
+        # WHERE rules and uses some names before defining them) -> exception,
+        # only fatal if they are actually requested
+        self._broken = {}
+
+    def _cacheFiles(self, cache_dir):
+        """Return the cache files to read from and the ones to write to, in
+        order of preference. The install or source tree is only read."""
+        name = self.schema_name + '.idx'
+        if cache_dir:
+            return [os.path.join(cache_dir, name)], [os.path.join(cache_dir, name)]
+        write_files = []
+        try:
+            import FreeCAD
+            write_files.append(os.path.join(FreeCAD.getUserAppDataDir(), 'SCL-' + name))
+        except (ImportError, AttributeError):
+            pass
+        write_files.append(os.path.join(tempfile.gettempdir(), 'SCL-' + name))
+        return write_files + [os.path.join(os.path.dirname(self.path), name)], write_files
+
+    def _loadIndex(self, cache_dir):
+        st = os.stat(self.path)
+        key = (INDEX_VERSION, int(st.st_mtime), st.st_size, sys.version_info[:2])
+        read_files, write_files = self._cacheFiles(cache_dir)
+        for cache_file in read_files:
+            try:
+                f = open(cache_file, 'rb')
+                try:
+                    if marshal.load(f) == key:
+                        return marshal.load(f)
+                finally:
+                    f.close()
+            except (IOError, EOFError, ValueError, TypeError):
+                pass
+        index = buildIndex(self._getSource())
+        for cache_file in write_files:
+            try:
+                f = open(cache_file, 'wb')
+                try:
+                    marshal.dump(key, f)
+                    marshal.dump(index, f)
+                finally:
+                    f.close()
+                break
+            except IOError:
+                pass
+        return index
+
+    def _getSource(self):
+        if self._source is None:
+            f = open(self.path, 'rb')
+            try:
+                self._source = f.read().replace('\r\n', '\n')
+            finally:
+                f.close()
+        return self._source
+
+    def hasEntity(self, name):
+        return self._index['attributes'].has_key(name.lower())
+
+    def getAttributes(self, name):
+        """Return the attribute names of an entity, inherited ones first"""
+        return self._index['attributes'][name.lower()]
+
+    def getSupertypes(self, name):
+        """Return the direct supertypes of an entity"""
+        return self._index['bases'].get(name.lower(), [])
+
+    def getDependencies(self, names):
+        """Return all schema names the definitions of names depend on,
+        including names themselves"""
+        needed = set()
+        stack = [n.lower() for n in names]
+        while stack:
+            name = stack.pop()
+            if name in needed or not self._ranges.has_key(name):
+                continue
+            needed.add(name)
+            stack.extend(self._index['uses'][name])
+        return needed
+
+    def getClass(self, name):
+        """Return the class of a schema definition, creating it and the
+        definitions it depends on first"""
+        name = name.lower()
+        scope = vars(self.module)
+        if not scope.has_key(name):
+            self.materialize([name])
+            if self._broken.has_key(name):
+                raise self._broken[name]
+            if not scope.has_key(name):
+                raise KeyError("Schema %s has no definition %s"%(self.schema_name, name))
+        return scope[name]
+
+    def materialize(self, names):
+        """Create the definitions of names and of what they depend on in the
+        schema scope, in source order like a full import would, except that
+        base classes always come first (the generator doesn't guarantee that)"""
+        scope = vars(self.module)
+        needed = set(n for n in self.getDependencies(names) if not scope.has_key(n) and not self._broken.has_key(n))
+        order = []
+        done = set()
+        for name in sorted(needed, key=lambda n: self._ranges[n][0]):
+            stack = [name]
+            while stack:
+                n = stack[-1]
+                if n in done:
+                    stack.pop()
+                    continue
+                pending = [b for b in self._index['bases'].get(n, []) if b in needed and b not in done and b not in stack]
+                if pending:
+                    stack.extend(pending)
+                else:
+                    stack.pop()
+                    done.add(n)
+                    order.append(n)
+        source = self._getSource()
+        for name in order:
+            if scope.has_key(name): # an ENUMERATION may have defined it already
+                continue
+            start, end, line = self._ranges[name]
+            # keep the line numbers of the module for tracebacks
+            text = '\n' * line + source[start:end]
+            try:
+                exec compile(text, self.path, 'exec') in scope
+            except Exception, e:
+                self._broken[name] = e
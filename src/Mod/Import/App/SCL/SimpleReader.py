@@ -32,11 +32,14 @@
 """Simple Part21 STEP reader
 
 Reads a given STEP file. Maps the enteties and instaciate the
-corosbonding classes.
+corosbonding classes, either all at once (instaciate) or only when they
+are accessed by id, by type or by traversal (getInstance,
+getInstancesByType, traverse).
 In addition it writes out a graphwiz file with the entity graph.
 """
 
-import Part21,sys
+import Part21,SchemaIndex,sys
+from collections import deque
 
 
 
@@ -60,9 +63,12 @@ class SimpleParser:
         import sys
         self._p21loader = Part21.Part21Parser(filename)
         #self._p21loader._number_of_ancestors = {} # not needed, save memory
-        self.schemaModule = None
-        self.schemaClasses = None
+        self.schema = None
+        # the schema lookup is done once, even if no schema module is found
+        self._schemaLoaded = False
         self.instanceMape = {}
+        # entity type name -> instance ids, built on first query
+        self._typeIndex = None
         #for i in self._p21loader._instances_definition.keys():
         #    print i,self._p21loader._instances_definition[i][0],self._p21loader._instances_definition[i][1]
 
@@ -70,6 +76,8 @@ class SimpleParser:
         for i in attrList:
             if isinstance(i,list):
                 self._writeGraphVizEdge(num,i,file)
+            elif isinstance(i,tuple): # typed parameter or partial entity: (name, attributes)
+                self._writeGraphVizEdge(num,i[1],file)
             elif  isinstance(i,str):
                 if not i == '' and i[0] == '#':
                     key = int(i[1:])
@@ -91,77 +99,136 @@ class SimpleParser:
             self._writeGraphVizEdge( i,self._p21loader._instances_definition[i][1],gvFile)
         gvFile.write('}\n')
 
+    def _loadSchema(self):
+        """Load the index of the schema of the file, once. The schema classes
+        are created on demand, only for the entity types used."""
+        if self._schemaLoaded:
+            return
+        self._schemaLoaded = True
+        self.schema = SchemaIndex.getSchema(self._p21loader.get_schema_name())
+
     def instaciate(self):
         """Instaciate the python classe from the enteties"""
-        import inspect
-        # load the needed schema module
-        if self._p21loader.get_schema_name() == 'config_control_design':
-            import config_control_design
-            self.schemaModule = config_control_design
-        if self._p21loader.get_schema_name() == 'automotive_design':
-            import automotive_design
-            self.schemaModule = automotive_design
-
-        if self.schemaModule:
-            self.schemaClasses = dict(inspect.getmembers(self.schemaModule))
-
         for i in self._p21loader._instances_definition.keys():
             #print i
             if not self.instanceMape.has_key(i):
                 self._create_entity_instance(i)
 
+    def getInstance(self, instance_id):
+        """Return the instance with the given id, creating it and the
+        instances it references on first access"""
+        if not self.instanceMape.has_key(instance_id):
+            self._create_entity_instance(instance_id)
+        return self.instanceMape[instance_id]
+
+    def getIdsByType(self, type_name):
+        """Return the ids of all instances of an entity type, e.g. 'ADVANCED_FACE',
+        without creating any instance. Complex instances are listed under
+        each of their partial entity types."""
+        if self._typeIndex is None:
+            self._typeIndex = {}
+            for i, (name, attributes) in self._p21loader._instances_definition.iteritems():
+                if name:
+                    self._typeIndex.setdefault(name, []).append(i)
+                else:
+                    for partial in attributes:
+                        if isinstance(partial, tuple):
+                            self._typeIndex.setdefault(partial[0], []).append(i)
+        return sorted(self._typeIndex.get(type_name.upper(), []))
+
+    def getInstancesByType(self, type_name):
+        """Return the instances of an entity type, only these and the instances
+        they reference are created"""
+        return [self.getInstance(i) for i in self.getIdsByType(type_name)]
+
+    def traverse(self, instance_id):
+        """Iterate over the ids of the instance and of all instances reachable
+        from it through references, breadth first, without creating instances"""
+        seen = set([instance_id])
+        queue = deque([instance_id])
+        while queue:
+            key = queue.popleft()
+            yield key
+            for ref in self._references(key):
+                if ref not in seen:
+                    seen.add(ref)
+                    queue.append(ref)
+
+    def _references(self, instance_id):
+        """Return the ids referenced by the attributes of an instance"""
+        refs = []
+        if not self._p21loader._instances_definition.has_key(instance_id):
+            return refs
+        stack = [self._p21loader._instances_definition[instance_id][1]]
+        while stack:
+            for i in stack.pop():
+                if isinstance(i,list):
+                    stack.append(i)
+                elif isinstance(i,tuple): # typed parameter or partial entity: (name, attributes)
+                    stack.append(i[1])
+                elif i[:1] == '#':
+                    refs.append(int(i[1:]))
+        return refs
+
     def _create_entity_instance(self, instance_id):
+        """Create the instance after all instances it references (depth first).
+        Uses an explicit stack, deep reference chains don't hit the recursion limit."""
+        stack = [instance_id]
+        expanded = set()
+        while stack:
+            key = stack[-1]
+            if self.instanceMape.has_key(key):
+                stack.pop()
+            elif key not in expanded:
+                expanded.add(key)
+                for ref in self._references(key):
+                    if not self.instanceMape.has_key(ref):
+                        # expanded but not yet created means ref is on the current path
+                        if ref in expanded:
+                            raise NameError("Cyclic instance reference: ",ref)
+                        stack.append(ref)
+            else:
+                stack.pop()
+                self._build_entity_instance(key)
+
+    def _build_entity_instance(self, instance_id):
         if self._p21loader._instances_definition.has_key(instance_id):
+            self._loadSchema()
             instance_definition = self._p21loader._instances_definition[instance_id]
-            #print "Instance definition to process",instance_definition
             # first find class name
             class_name = instance_definition[0].lower()
-            #print "Class name:%s"%class_name
 
-            if not class_name=='':
-                classDef = self.schemaClasses[class_name]
-                # then attributes
-                #print object_.__doc__
-            instance_attributes = instance_definition[1]
-            self._transformAttributes(instance_attributes)
-            print 'Attribute list after transform: ',instance_attributes
+            if not class_name=='' and self.schema:
+                classDef = self.schema.getClass(class_name)
+            # then attributes
+            instance_attributes = self._transformAttributes(instance_definition[1])
 
             self.instanceMape[instance_id] = str('dummy#:'+str(instance_id)) # dummy instance to test
         else:
             print '############################# lost entity: ',instance_id
             self.instanceMape[instance_id] = int(41) # dummy
-        #print "instance_attributes:",instance_attributes
-        #a = object_(*instance_attributes)
 
     def _transformAttributes(self,attrList):
-        n = 0
+        """Return a copy of the attributes with the '#id' references replaced
+        by the (already created) instances. The parsed definitions stay as
+        they are, _references, traverse and writeGraphViz still need them."""
+        result = []
         for i in attrList:
             if isinstance(i,list):
-                self._transformAttributes(i)
-            elif  isinstance(i,str):
-                if i == '':
-                    print 'empty string'
-                elif i[0] == '#':
+                result.append(self._transformAttributes(i))
+            elif isinstance(i,tuple): # typed parameter or partial entity: (name, attributes)
+                result.append((i[0], self._transformAttributes(i[1])))
+            elif isinstance(i,str):
+                if i[:1] == '#':
                     key = int(i[1:])
-                    #print 'Item: ',int(i[1:])
-                    if self.instanceMape.has_key(key):
-                        attrList[n] =  self.instanceMape[key]
-                    else:
-                        self._create_entity_instance(key)
-                        if not self.instanceMape.has_key(key):
-                            raise NameError("Needed instance not instanciated: ",key)
-                        else:
-                            attrList[n] =  self.instanceMape[key]
-                elif i[0] == '$':
-                    #print 'Dollar'
-                    pass
-                elif i[0] == "'":
-                    print 'Dopelstring: ',i[1:-1]
+                    if not self.instanceMape.has_key(key):
+                        raise NameError("Needed instance not instanciated: ",key)
+                    result.append(self.instanceMape[key])
                 else:
-                    print 'String: ',i
+                    result.append(i)
             else:
                 raise NameError("Unknown attribute type")
-            n = n+1
+        return result
 
 if __name__ == "__main__":
     sys.path.append('..') # path where config_control_design.py is found